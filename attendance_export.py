@@ -0,0 +1,141 @@
+import csv
+import io
+import logging
+from datetime import datetime, timedelta
+
+from config import db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 2000
+# CSV rows buffered per yielded chunk
+CSV_CHUNK_ROWS = 1000
+PARQUET_ROW_GROUP_ROWS = 50000
+EXPORT_COLUMNS = ["user_id", "user_name", "roll_number", "timestamp", "date", "time"]
+
+
+def parse_export_filters(args):
+    """Query filters from request args: start/end (YYYY-MM-DD, inclusive) and department."""
+    start = args.get('start')
+    end = args.get('end')
+    return {
+        "start": datetime.fromisoformat(start) if start else None,
+        "end": datetime.fromisoformat(end) + timedelta(days=1) if end else None,
+        "department": args.get('department') or None,
+    }
+
+
+def export_rows(start=None, end=None, department=None):
+    """Yield attendance rows joined with their user, oldest first.
+
+    Users are read once into a small id -> (name, roll) map; attendance is
+    streamed from a server-side cursor in EXPORT_BATCH_SIZE batches.
+    """
+    user_query = {"department": department} if department else {}
+    user_map = {
+        u['_id']: (u['name'], u['roll_number'])
+        for u in db.users.find(user_query, {"name": 1, "roll_number": 1})
+    }
+    query = {}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    if department:
+        query["user_id"] = {"$in": list(user_map)}
+
+    cursor = db.attendance.find(query, {"user_id": 1, "timestamp": 1}).sort("timestamp", 1)
+    for a in cursor.batch_size(EXPORT_BATCH_SIZE):
+        u = user_map.get(a['user_id'])
+        if not u:
+            continue
+        timestamp = a['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        yield str(a['user_id']), u[0], u[1], timestamp
+
+
+def stream_csv(rows):
+    """Encode rows as CSV, yielding UTF-8 chunks of CSV_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for user_id, name, roll_number, timestamp in rows:
+        writer.writerow([user_id, name, roll_number, timestamp, timestamp.date(), timestamp.time()])
+        count += 1
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet(rows):
+    """Encode rows as Parquet, yielding bytes after every row group.
+
+    Needs the optional ``pyarrow`` package.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("user_id", pa.string()), ("user_name", pa.string()), ("roll_number", pa.string()),
+        ("timestamp", pa.timestamp("ms")), ("date", pa.date32()), ("time", pa.time64("us")),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write_group(columns):
+        writer.write_table(pa.table(columns, schema=schema))
+        return sink.drain()
+
+    columns = {name: [] for name in EXPORT_COLUMNS}
+    for user_id, name, roll_number, timestamp in rows:
+        columns["user_id"].append(user_id)
+        columns["user_name"].append(name)
+        columns["roll_number"].append(str(roll_number))
+        columns["timestamp"].append(timestamp)
+        columns["date"].append(timestamp.date())
+        columns["time"].append(timestamp.time())
+        if len(columns["user_id"]) >= PARQUET_ROW_GROUP_ROWS:
+            yield write_group(columns)
+            columns = {name: [] for name in EXPORT_COLUMNS}
+    if columns["user_id"]:
+        yield write_group(columns)
+    writer.close()
+    yield sink.drain()
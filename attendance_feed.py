@@ -0,0 +1,105 @@
+"""Recent attendance kept in memory for /history and dashboard pushes.
+
+The feed is seeded once from the newest attendance records, with names
+and roll numbers joined from the face gallery instead of a $lookup, and
+then updated as attendance is recorded. /history serves the cached JSON
+body with an ETag; dashboards get each new entry over Socket.IO.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+
+from config import db
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FEED_SIZE = int(os.getenv("HISTORY_FEED_SIZE", 100))
+
+
+def feed_entry(name, roll_number, timestamp):
+    return {
+        "name": name,
+        "roll_number": roll_number,
+        "time": timestamp.strftime('%H:%M:%S'),
+        "date": timestamp.strftime('%Y-%m-%d'),
+    }
+
+
+class AttendanceFeed:
+    """Ring buffer of the latest attendance entries, newest first.
+
+    The serialized body and its ETag are computed once per change, so
+    repeated requests cost neither a query nor a json.dumps. The ETag is
+    a hash of the body, so workers holding the same entries agree on it.
+    """
+
+    def __init__(self, size=HISTORY_FEED_SIZE):
+        self.size = size
+        # (user_id, entry), newest at the left
+        self._entries = deque(maxlen=size)
+        self.seeded = False
+        self._body = None
+        self._etag = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _changed(self):
+        self._body = self._etag = None
+
+    def replace(self, entries):
+        """Set the contents from (user_id, entry) pairs, newest first."""
+        self._entries = deque(entries, maxlen=self.size)
+        self.seeded = True
+        self._changed()
+
+    def add(self, user_id, name, roll_number, timestamp):
+        """Record a new attendance event; returns its entry for pushing."""
+        entry = feed_entry(name, roll_number, timestamp)
+        self._entries.appendleft((str(user_id), entry))
+        self._changed()
+        return entry
+
+    def remove_user(self, user_id):
+        user_id = str(user_id)
+        kept = [item for item in self._entries if item[0] != user_id]
+        if len(kept) != len(self._entries):
+            self.replace(kept)
+
+    def entries(self):
+        return [entry for _, entry in self._entries]
+
+    def body(self):
+        """(JSON bytes, ETag) of the current entries."""
+        if self._body is None:
+            self._body = json.dumps(self.entries()).encode('utf-8')
+            self._etag = hashlib.sha1(self._body).hexdigest()
+        return self._body, self._etag
+
+
+def load_recent_attendance(gallery, limit=HISTORY_FEED_SIZE, database=None):
+    """(user_id, entry) pairs for the newest attendance records, newest first.
+
+    Names come from ``gallery``; users missing from it (e.g. whose
+    encoding failed to decode) are looked up in one query. Records of
+    users that no longer exist are skipped, as /history always did.
+    """
+    database = db if database is None else database
+    records = list(database.attendance.find({}, {"user_id": 1, "timestamp": 1})
+                   .sort("timestamp", -1).limit(limit))
+    people = {}
+    missing = set()
+    for record in records:
+        user_id = str(record["user_id"])
+        person = gallery.lookup(user_id) if gallery is not None else None
+        if person is None:
+            missing.add(record["user_id"])
+        else:
+            people[user_id] = person
+    if missing:
+        for user in database.users.find({"_id": {"$in": list(missing)}}, {"name": 1, "roll_number": 1}):
+            people[str(user["_id"])] = (user["name"], user["roll_number"])
+    return [(str(record["user_id"]), feed_entry(*people[str(record["user_id"])], record["timestamp"]))
+            for record in records if str(record["user_id"]) in people]
@@ -0,0 +1,190 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from config import db
+from metrics import db_seconds
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 4096))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", 300))
+# Most recent records kept with a summary for the recognition popup
+HISTORY_PREVIEW = 10
+
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return None if entry is None else entry[1]
+
+
+summary_cache = TTLCache(SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+
+
+def month_key(day):
+    return day.strftime('%Y-%m')
+
+
+@lru_cache(maxsize=64)
+def working_days(first_day, last_day):
+    """Weekdays from ``first_day`` to ``last_day`` inclusive, as YYYY-MM-DD strings."""
+    return tuple(
+        (first_day + timedelta(days=i)).strftime('%Y-%m-%d')
+        for i in range((last_day - first_day).days + 1)
+        if (first_day + timedelta(days=i)).weekday() < 5
+    )
+
+
+def attendance_percentage(attended_days, today=None):
+    today = today or date.today()
+    days = working_days(today.replace(day=1), today)
+    return round(len(attended_days) / len(days) * 100, 2) if days else 0
+
+
+def monthly_attended_days(obj_id, first_day):
+    """Days a user attended in the month starting at ``first_day``.
+
+    Read from the ``attendance_monthly`` summary. The first read of a
+    user-month backfills it from ``attendance`` with one aggregation.
+    """
+    key = month_key(first_day)
+    summary = db.attendance_monthly.find_one({"user_id": obj_id, "month": key})
+    if summary and summary.get("seeded"):
+        return set(summary.get("days", []))
+
+    next_month = date(first_day.year + (first_day.month // 12), (first_day.month % 12) + 1, 1)
+    attended_dates = db.attendance.aggregate([
+        {"$match": {
+            "user_id": obj_id,
+            "timestamp": {
+                "$gte": datetime.combine(first_day, datetime.min.time()),
+                "$lt": datetime.combine(next_month, datetime.min.time())
+            }
+        }},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
+        }}
+    ])
+    days = {entry['_id'] for entry in attended_dates}
+    if summary:
+        days.update(summary.get("days", []))
+    db.attendance_monthly.update_one(
+        {"user_id": obj_id, "month": key},
+        {"$addToSet": {"days": {"$each": sorted(days)}}, "$set": {"seeded": True}},
+        upsert=True)
+    return days
+
+
+def record_monthly_attendance(records):
+    """Fold written attendance records into the per-user monthly summaries."""
+    updates = {}
+    for record in records:
+        key = (record["user_id"], month_key(record["timestamp"]))
+        updates.setdefault(key, set()).add(record["timestamp"].strftime('%Y-%m-%d'))
+    if not updates:
+        return
+    db.attendance_monthly.bulk_write([
+        UpdateOne({"user_id": user_id, "month": month},
+                  {"$addToSet": {"days": {"$each": sorted(days)}}}, upsert=True)
+        for (user_id, month), days in updates.items()
+    ], ordered=False)
+
+
+def _history_entry(timestamp):
+    return {"time": timestamp.strftime('%H:%M:%S'), "date": timestamp.strftime('%Y-%m-%d')}
+
+
+def _load_summary(user_id, pending_timestamps):
+    obj_id = ObjectId(user_id)
+    user = db.users.find_one({"_id": obj_id}, {"name": 1, "roll_number": 1, "department": 1, "role": 1})
+    if not user:
+        return None
+    first_day = date.today().replace(day=1)
+    attended = monthly_attended_days(obj_id, first_day)
+    recent = db.attendance.find({"user_id": obj_id}, {"timestamp": 1}).sort("timestamp", -1).limit(HISTORY_PREVIEW)
+    timestamps = sorted(pending_timestamps, reverse=True) + [r["timestamp"] for r in recent]
+    attended.update(ts.strftime('%Y-%m-%d') for ts in pending_timestamps if ts.date() >= first_day)
+    return {
+        "name": user["name"],
+        "roll_number": user["roll_number"],
+        "department": user["department"],
+        "role": user["role"],
+        "month": month_key(first_day),
+        "attended": attended,
+        "history": [_history_entry(ts) for ts in timestamps[:HISTORY_PREVIEW]],
+    }
+
+
+def get_user_summary(user_id, pending_timestamps=()):
+    """Profile, recent history and this month's attendance for a user.
+
+    Served from an LRU/TTL cache that ``note_attendance`` keeps current,
+    so repeated lookups on the recognition path cost no queries.
+    ``pending_timestamps`` are records still in the write buffer, merged
+    in when the summary has to be loaded.
+    """
+    user_id = str(user_id)
+    try:
+        summary = summary_cache.get(user_id)
+        if summary is None or summary["month"] != month_key(date.today()):
+            with db_seconds.time("summary_load"):
+                summary = _load_summary(user_id, pending_timestamps)
+            if summary is None:
+                return {'error': 'User not found'}
+            summary_cache.set(user_id, summary)
+        return {
+            "name": summary["name"],
+            "roll_number": summary["roll_number"],
+            "department": summary["department"],
+            "role": summary["role"],
+            "history": list(summary["history"]),
+            "attended_dates": sorted(summary["attended"]),
+            "attendance_percentage": attendance_percentage(summary["attended"]),
+        }
+    except Exception as e:
+        logger.error(f"Get summary error: {e}")
+        return {"error": "Server error"}
+
+
+def note_attendance(user_id, timestamp):
+    """Apply a new attendance record to the cached summary, if any."""
+    summary = summary_cache.get(str(user_id))
+    if summary is None or summary["month"] != month_key(timestamp):
+        return
+    summary["attended"].add(timestamp.strftime('%Y-%m-%d'))
+    summary["history"] = [_history_entry(timestamp)] + summary["history"][:HISTORY_PREVIEW - 1]
+
+
+def forget_user(user_id):
+    summary_cache.pop(str(user_id))
@@ -1,40 +1,208 @@
 from config import db
+import os
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from face_gallery import FaceGallery, ENCODING_DIM
+from encoding_codec import GALLERY_PROJECTION, unpack_encoding
+from attendance_summary import note_attendance, record_monthly_attendance
+from metrics import db_seconds
+from schema import ensure_index
+from gallery_snapshot import load_snapshot, save_snapshot
 
 logger = logging.getLogger(__name__)
 
-def load_face_encodings():
-    known_faces = {}
+# Changes are re-read with this much overlap so writes from a server with a
+# slightly skewed clock are not missed
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+def load_face_encodings(database=None):
+    database = db if database is None else database
+    ids, names, roll_numbers = [], [], []
+    departments, roles = [], []
     encoding_errors = 0
+    loaded_at = datetime.now()
     try:
-        users = db.users.find()
-        for user in users:
+        # Decode straight into one preallocated matrix; grow only if users
+        # were added while the cursor was open
+        encodings = np.empty((database.users.estimated_document_count(), ENCODING_DIM), dtype=np.float32)
+        count = 0
+        for user in database.users.find({}, GALLERY_PROJECTION):
             try:
-                encoding = np.array(user['face_encoding'], dtype=np.float64)
-                known_faces[str(user['_id'])] = {
-                    "encoding": encoding,
-                    "name": user["name"],
-                    "roll_number": user["roll_number"]
-                }
+                if count == len(encodings):
+                    encodings = np.concatenate([encodings, np.empty_like(encodings[:max(count, 16)])])
+                unpack_encoding(user, out=encodings[count])
+                ids.append(str(user['_id']))
+                names.append(user["name"])
+                roll_numbers.append(user["roll_number"])
+                departments.append(user.get("department"))
+                roles.append(user.get("role"))
+                count += 1
             except Exception as e:
                 logger.error(f"Decoding error: {e}")
                 encoding_errors += 1
-        return known_faces, encoding_errors
+        gallery = FaceGallery(ids, names, roll_numbers, encodings[:count], departments, roles)
+        gallery.watermark = loaded_at
+        return gallery, encoding_errors
     except Exception as e:
         logger.error(f"DB error: {e}")
-        return {}, encoding_errors
+        return FaceGallery([], [], [], []), encoding_errors
+
+def add_user_to_gallery(gallery, user):
+    """Insert a freshly registered user document into a loaded gallery."""
+    gallery.add(str(user['_id']), user["name"], user["roll_number"], unpack_encoding(user),
+                user.get("department"), user.get("role"))
+
+def apply_face_encoding_changes(gallery, database=None):
+    """Bring a gallery up to date with users registered or deleted since it was loaded.
+
+    Only documents changed after ``gallery.watermark`` are read, so the cost
+    follows the number of changes rather than the enrollment size.
+    ``database`` defaults to the shared connection; any object exposing
+    ``users`` and ``user_deletions`` collections will do. Returns
+    (applied_changes, encoding_errors).
+    """
+    database = db if database is None else database
+    applied, encoding_errors = 0, 0
+    refreshed_at = datetime.now()
+    since = gallery.watermark - WATERMARK_OVERLAP if gallery.watermark else datetime.min
+    try:
+        with db_seconds.time("gallery_refresh"):
+            changed = list(database.users.find({"updated_at": {"$gt": since}}, GALLERY_PROJECTION))
+            deletions = list(database.user_deletions.find({"deleted_at": {"$gt": since}}, {"user_id": 1}))
+        for user in changed:
+            user_id = str(user['_id'])
+            # Rows inside the overlap window were applied by the previous refresh
+            if gallery.watermark and user['updated_at'] <= gallery.watermark and user_id in gallery:
+                continue
+            try:
+                add_user_to_gallery(gallery, user)
+                applied += 1
+            except Exception as e:
+                logger.error(f"Decoding error: {e}")
+                encoding_errors += 1
+        for deletion in deletions:
+            if gallery.remove(str(deletion['user_id'])):
+                applied += 1
+        gallery.watermark = refreshed_at
+    except Exception as e:
+        logger.error(f"DB error: {e}")
+    return applied, encoding_errors
+
+def load_gallery(database=None):
+    """Gallery from the local snapshot plus later changes, else a full load.
+
+    A full load writes a fresh snapshot for the next start. Returns
+    (gallery, encoding_errors).
+    """
+    gallery = load_snapshot()
+    if gallery is not None:
+        applied, encoding_errors = apply_face_encoding_changes(gallery, database)
+        logger.info(f"Gallery snapshot loaded ({len(gallery)} users, {applied} changes since).")
+        if applied:
+            save_snapshot(gallery)
+        return gallery, encoding_errors
+    gallery, encoding_errors = load_face_encodings(database)
+    # No watermark means the load failed; do not snapshot an empty gallery
+    if gallery.watermark is not None:
+        save_snapshot(gallery)
+    return gallery, encoding_errors
+
+# Attendance of one user is recorded at most once per bucket of this length
+ATTENDANCE_DEDUP_SECONDS = 60
+ATTENDANCE_FLUSH_SIZE = int(os.getenv("ATTENDANCE_FLUSH_SIZE", 50))
+ATTENDANCE_FLUSH_SECONDS = float(os.getenv("ATTENDANCE_FLUSH_SECONDS", 2))
+DUPLICATE_KEY_ERROR = 11000
+
+def attendance_bucket(timestamp):
+    return int(timestamp.timestamp() // ATTENDANCE_DEDUP_SECONDS)
+
+class AttendanceBuffer:
+    """Write-behind buffer for attendance records.
+
+    Records are coalesced per (user_id, bucket) and written with one
+    unordered insert_many once ATTENDANCE_FLUSH_SIZE are pending or when
+    the periodic flush runs. A unique index on (user_id, bucket) makes the
+    dedup durable across restarts and workers.
+    """
+
+    def __init__(self, collection=None):
+        self._collection = collection
+        self._pending = {}
+        self._index_ready = False
+
+    @property
+    def collection(self):
+        return db.attendance if self._collection is None else self._collection
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, user_id, timestamp=None):
+        """Queue a record; returns False if one is already queued for this bucket."""
+        timestamp = timestamp or datetime.now()
+        bucket = attendance_bucket(timestamp)
+        key = (str(user_id), bucket)
+        if key in self._pending:
+            return False
+        self._pending[key] = {"user_id": ObjectId(user_id), "timestamp": timestamp, "bucket": bucket}
+        note_attendance(user_id, timestamp)
+        if len(self._pending) >= ATTENDANCE_FLUSH_SIZE:
+            self.flush()
+        return True
+
+    def pending_for(self, user_id):
+        """Timestamps queued for a user but not written yet."""
+        user_id = str(user_id)
+        return [doc["timestamp"] for (pending_id, _), doc in self._pending.items() if pending_id == user_id]
+
+    def _ensure_index(self):
+        if self._index_ready:
+            return
+        ensure_index(self.collection, "attendance_dedup")
+        self._index_ready = True
+
+    def flush(self):
+        """Write all pending records. Returns the number inserted."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        docs = list(batch.values())
+        try:
+            self._ensure_index()
+            with db_seconds.time("attendance_insert"):
+                result = self.collection.insert_many(docs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            failed = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+            for err in failed:
+                logger.error(f"Error recording attendance: {err.get('errmsg')}")
+        except Exception as e:
+            logger.error(f"Error recording attendance, will retry: {e}")
+            # Keep the batch for the next flush; newer records win on conflict
+            batch.update(self._pending)
+            self._pending = batch
+            return 0
+        try:
+            with db_seconds.time("monthly_summary"):
+                record_monthly_attendance(docs)
+        except Exception as e:
+            logger.error(f"Error updating attendance summaries: {e}")
+        logger.info(f"Recorded {inserted} attendance entries")
+        return inserted
+
+attendance_buffer = AttendanceBuffer()
 
-def record_attendance(user_id, last_attendance):
-    current_time = datetime.now()
+def record_attendance(user_id):
+    """Queue an attendance record; returns its timestamp, or None if not queued."""
     try:
-        db.attendance.insert_one({
-            "user_id": ObjectId(user_id),
-            "timestamp": current_time
-        })
-        last_attendance[user_id] = current_time
-        logger.info(f"Attendance recorded for {user_id}")
+        timestamp = datetime.now()
+        if attendance_buffer.add(user_id, timestamp):
+            return timestamp
     except Exception as e:
-        logger.error(f"Error recording attendance: {e}")
\ No newline at end of file
+        logger.error(f"Error recording attendance: {e}")
+    return None
@@ -0,0 +1,102 @@
+"""History lookup latency against history length, and export throughput.
+
+    python bench/bench_data.py --history 10 1000 10000 --export-rows 100000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from common import (setup_database, synthetic_encodings, seed_users, percentiles,
+                    environment, emit)
+
+
+def seed_attendance(db, user_ids, count, batch=10000):
+    """``count`` records spread round-robin over ``user_ids``, one minute apart."""
+    now = datetime.now()
+    for start in range(0, count, batch):
+        db.attendance.insert_many([
+            {"user_id": user_ids[i % len(user_ids)], "timestamp": now - timedelta(minutes=i)}
+            for i in range(start, min(start + batch, count))
+        ])
+
+
+def bench_history(db, lengths, repeats):
+    from attendance_summary import forget_user
+    from user_utils import get_user_history
+
+    results = []
+    for length in lengths:
+        db.attendance.drop()
+        db.attendance_monthly.drop()
+        user_id = seed_users(db, synthetic_encodings(1))[0]
+        seed_attendance(db, [user_id], length)
+        cold, warm, deep = [], [], []
+        for _ in range(repeats):
+            # Cold: summary not cached, as after a restart or TTL expiry
+            db.attendance_monthly.drop()
+            forget_user(user_id)
+            t0 = time.perf_counter()
+            page = get_user_history(str(user_id))
+            cold.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            get_user_history(str(user_id))
+            warm.append((time.perf_counter() - t0) * 1000)
+            if page.get("next_cursor"):
+                t0 = time.perf_counter()
+                get_user_history(str(user_id), before=page["next_cursor"])
+                deep.append((time.perf_counter() - t0) * 1000)
+        results.append({
+            "history_length": length,
+            "cold": percentiles(cold),
+            "warm": percentiles(warm),
+            "next_page": percentiles(deep) if deep else None,
+        })
+        db.users.delete_one({"_id": user_id})
+    return results
+
+
+def bench_export(db, rows, users):
+    from attendance_export import export_rows, stream_csv, stream_parquet, parquet_available
+
+    db.attendance.drop()
+    db.users.drop()
+    user_ids = seed_users(db, synthetic_encodings(users))
+    seed_attendance(db, user_ids, rows)
+    formats = [("csv", stream_csv)]
+    if parquet_available():
+        formats.append(("parquet", stream_parquet))
+    results = []
+    for name, encoder in formats:
+        t0 = time.perf_counter()
+        size = sum(len(chunk) for chunk in encoder(export_rows()))
+        elapsed = time.perf_counter() - t0
+        results.append({
+            "format": name, "rows": rows, "bytes": size, "seconds": elapsed,
+            "rows_per_s": rows / elapsed, "mb_per_s": size / elapsed / 1e6,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--export-rows", type=int, default=100000)
+    parser.add_argument("--export-users", type=int, default=500)
+    parser.add_argument("--mongo-uri", help="scratch MongoDB instead of mongomock (it is dropped!)")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    backend = setup_database(args.mongo_uri)
+    from config import db
+
+    emit({
+        "benchmark": "data",
+        "environment": environment(backend),
+        "history": bench_history(db, args.history, args.repeats),
+        "export": bench_export(db, args.export_rows, args.export_users),
+    }, args.out)
+
+
+if __name__ == "__main__":
+    main()
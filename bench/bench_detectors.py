@@ -0,0 +1,114 @@
+"""Detection latency against recall per backend, detection width and upsample.
+
+Needs a directory of photos with faces. Reference boxes come from the
+``--reference`` backend on each full-size photo (upsample 2). Every photo
+is then used as is ("close") and shrunk onto a 1920x1080 canvas at
+several scales ("far", like the back of a classroom), and each detector
+setting is scored against the mapped reference boxes:
+
+    python bench/bench_detectors.py --images faces/ --widths 320 640 960 1280
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from common import percentiles, environment, emit
+
+import detectors  # noqa: E402
+from face_tracker import box_iou  # noqa: E402
+
+CANVAS = (1080, 1920)
+MATCH_IOU = 0.4
+
+
+def load_photos(directory, limit):
+    paths = sorted(glob.glob(os.path.join(directory, "*.jp*g")) + glob.glob(os.path.join(directory, "*.png")))
+    photos = [cv2.imread(path) for path in paths[:limit]]
+    return [photo for photo in photos if photo is not None]
+
+
+def build_cases(photos, reference, scales, seed):
+    """(scenario, frame, ground-truth boxes) for every photo and scale."""
+    rng = np.random.default_rng(seed)
+    cases = []
+    for photo in photos:
+        truth, _ = detectors.detect_faces(photo, reference, photo.shape[1], 2)
+        if not truth:
+            continue
+        cases.append(("close", photo, truth))
+        for scale in scales:
+            small = cv2.resize(photo, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            height, width = small.shape[:2]
+            if height >= CANVAS[0] or width >= CANVAS[1]:
+                continue
+            top = int(rng.integers(0, CANVAS[0] - height))
+            left = int(rng.integers(0, CANVAS[1] - width))
+            canvas = np.full(CANVAS + (3,), 127, np.uint8)
+            canvas[top:top + height, left:left + width] = small
+            boxes = [(int(t * scale) + top, int(r * scale) + left, int(b * scale) + top, int(l * scale) + left)
+                     for t, r, b, l in truth]
+            cases.append((f"far_x{scale}", canvas, boxes))
+    return cases
+
+
+def score(found, truth):
+    matched, used = 0, set()
+    for box in truth:
+        best = max(((box_iou(box, candidate), i) for i, candidate in enumerate(found) if i not in used),
+                   default=(0, None))
+        if best[0] >= MATCH_IOU:
+            matched += 1
+            used.add(best[1])
+    return matched, len(found) - len(used)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", required=True, help="directory of .jpg/.png photos with faces")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--backends", nargs="+", default=list(detectors.BACKENDS))
+    parser.add_argument("--widths", type=int, nargs="+", default=[320, 480, 640, 960, 1280])
+    parser.add_argument("--upsample", type=int, nargs="+", default=[0, 1])
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.5, 0.25])
+    parser.add_argument("--reference", default="hog")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    backends = [b for b in args.backends if b != "yunet" or detectors.yunet_available()]
+    cases = build_cases(load_photos(args.images, args.limit), args.reference, args.scales, args.seed)
+    scenarios = sorted({scenario for scenario, _, _ in cases})
+
+    results = []
+    for backend in backends:
+        # YuNet has no upsampling; the width alone sets its scale
+        for upsample in (args.upsample if backend == "hog" else [0]):
+            for width in args.widths:
+                for scenario in scenarios:
+                    latencies, found_total, truth_total, false_positives = [], 0, 0, 0
+                    for name, frame, truth in cases:
+                        if name != scenario:
+                            continue
+                        t0 = time.perf_counter()
+                        found, _ = detectors.detect_faces(frame, backend, width, upsample)
+                        latencies.append((time.perf_counter() - t0) * 1000)
+                        matched, extra = score(found, truth)
+                        found_total += matched
+                        truth_total += len(truth)
+                        false_positives += extra
+                    results.append({
+                        "backend": backend, "width": width, "upsample": upsample, "scenario": scenario,
+                        "frames": len(latencies), "recall": found_total / truth_total if truth_total else None,
+                        "false_positives": false_positives, **percentiles(latencies),
+                    })
+    emit({"benchmark": "detectors", "reference": args.reference,
+          "skipped_backends": sorted(set(args.backends) - set(backends)),
+          "environment": environment(None), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Recall@1 and latency of the approximate matcher against brute force.
+
+Runs on synthetic 128-d galleries, no camera or database needed:
+
+    python bench/bench_matchers.py --sizes 10000 50000 --probes 4 8 16
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_gallery import FaceGallery, ENCODING_DIM  # noqa: E402
+from matchers import BruteForceMatcher, IVFMatcher  # noqa: E402
+
+
+def synthetic_gallery(size, seed=0):
+    """Gallery whose encodings mimic dlib's spread (norm ~1, same-person dist ~0.3)."""
+    rng = np.random.default_rng(seed)
+    # A handful of broad clusters stands in for demographic structure
+    centres = rng.normal(0, 0.08, (32, ENCODING_DIM))
+    encodings = centres[rng.integers(0, len(centres), size)] + rng.normal(0, 0.05, (size, ENCODING_DIM))
+    ids = [str(i) for i in range(size)]
+    return FaceGallery(ids, ids, ids, encodings.astype(np.float32), backend="brute")
+
+
+def synthetic_queries(gallery, count, seed=1):
+    rng = np.random.default_rng(seed)
+    truth = rng.integers(0, len(gallery), count)
+    queries = gallery.encodings[truth] + rng.normal(0, 0.02, (count, ENCODING_DIM)).astype(np.float32)
+    return queries, truth
+
+
+def time_search(matcher, queries, batch):
+    latencies = []
+    found = []
+    for start in range(0, len(queries), batch):
+        chunk = queries[start:start + batch]
+        t0 = time.perf_counter()
+        rows, _ = matcher.search(chunk)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append(rows)
+    return np.concatenate(found), np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--probes", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--lists", type=int, default=0, help="IVF partitions (0 = auto)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=4, help="faces per frame")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        gallery = synthetic_gallery(size)
+        queries, _ = synthetic_queries(gallery, args.queries)
+        exact, brute_ms = time_search(BruteForceMatcher(gallery), queries, args.batch)
+        results.append({
+            "backend": "brute", "gallery_size": size, "recall_at_1": 1.0,
+            "p50_ms": float(np.percentile(brute_ms, 50)), "p99_ms": float(np.percentile(brute_ms, 99)),
+        })
+        for n_probe in args.probes:
+            t0 = time.perf_counter()
+            matcher = IVFMatcher(gallery, n_lists=args.lists, n_probe=n_probe)
+            build_s = time.perf_counter() - t0
+            found, ivf_ms = time_search(matcher, queries, args.batch)
+            results.append({
+                "backend": "ivf", "gallery_size": size, "n_lists": len(matcher.centroids),
+                "n_probe": matcher.n_probe, "build_s": build_s,
+                "recall_at_1": float(np.mean(found == exact)),
+                "p50_ms": float(np.percentile(ivf_ms, 50)), "p99_ms": float(np.percentile(ivf_ms, 99)),
+            })
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Memory over a long synthetic frame stream through ``main.process_frame``.
+
+Traced Python/numpy allocations (tracemalloc) and RSS are sampled every
+``--interval`` frames. After a warm-up (caches, buffers and the claim
+table fill up) both should stay flat; the reported slopes are bytes per
+1000 frames from a linear fit, and the run fails (exit 1) when RSS grows
+faster than ``--max-growth-kb``. The biggest tracemalloc growth sites are
+listed to find a leak. Frames show a fixed set of ``--people`` so the
+attendance written to the (in-process) mock database levels off too.
+``--gc-per-frame`` forces a full collection after every frame, as the
+frame path used to, to compare latency and pauses:
+
+    python bench/bench_memory.py --frames 20000 --interval 500
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import setup_database, synthetic_encodings, synthetic_frames, seed_users, percentiles, environment, emit
+from bench_pipeline import SyntheticFaces
+
+# Fraction of the run treated as warm-up and left out of the fit
+WARMUP_FRACTION = 0.2
+
+
+def rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def slope_per_1000(samples, key):
+    """Growth of ``key`` in bytes per 1000 frames, fitted on the post-warm-up samples."""
+    frames = np.array([s["frame"] for s in samples], dtype=float)
+    values = np.array([s[key] for s in samples], dtype=float)
+    if len(frames) < 2:
+        return 0.0
+    return float(np.polyfit(frames, values, 1)[0] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--interval", type=int, default=500, help="frames between samples")
+    parser.add_argument("--distinct-frames", type=int, default=50, help="synthetic JPEGs cycled through")
+    parser.add_argument("--size", type=int, default=1000, help="gallery size")
+    parser.add_argument("--faces", type=int, default=2, help="synthetic faces per frame")
+    parser.add_argument("--people", type=int, default=20, help="distinct people appearing in the frames")
+    parser.add_argument("--gc-per-frame", action="store_true", help="gc.collect() after every frame")
+    parser.add_argument("--max-growth-kb", type=float, default=64.0,
+                        help="RSS growth per 1000 frames above which the run fails")
+    parser.add_argument("--mongo-uri", help="scratch MongoDB instead of mongomock (it is dropped!)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    backend = setup_database(args.mongo_uri)
+    os.environ["RECOGNITION_WORKERS"] = "0"
+    encodings = synthetic_encodings(args.size, args.seed)
+    SyntheticFaces(encodings[:args.people], args.faces, args.seed).install()
+    frames = synthetic_frames(args.distinct_frames, seed=args.seed)
+
+    import main as app_main
+    from attendance_utils import load_face_encodings, attendance_buffer
+    from camera_sessions import CameraSession
+    from metrics import gc_seconds
+
+    app_main.background_tasks_started = True  # flushed below, like the background loop would
+    app_main.state.set_flag("running", True)
+    app_main.FRAME_SKIP_MS = 0
+    seed_users(app_main.db, encodings)
+    app_main.face_encoding_cache, _ = load_face_encodings()
+    session = CameraSession("bench-memory")
+
+    tracemalloc.start()
+    gc_before = [stats["collections"] for stats in gc.get_stats()]
+    warmup_frames = int(args.frames * WARMUP_FRACTION)
+    samples = []
+    # Preallocated so the measurement itself does not grow
+    latencies = np.empty(args.frames)
+    warm_snapshot = None
+    for n in range(1, args.frames + 1):
+        t0 = time.perf_counter()
+        app_main.process_frame(session, frames[n % len(frames)])
+        if args.gc_per_frame:
+            gc.collect()
+        latencies[n - 1] = (time.perf_counter() - t0) * 1000
+        if n % 100 == 0:
+            attendance_buffer.flush()
+        if n == warmup_frames:
+            warm_snapshot = tracemalloc.take_snapshot()
+        if n % args.interval == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({"frame": n, "traced_bytes": current, "traced_peak_bytes": peak, "rss_bytes": rss_bytes()})
+
+    growth = []
+    if warm_snapshot is not None:
+        top = tracemalloc.take_snapshot().compare_to(warm_snapshot, "lineno")[:10]
+        growth = [{"site": str(stat.traceback), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff}
+                  for stat in top]
+    tracemalloc.stop()
+
+    steady = [s for s in samples if s["frame"] > warmup_frames]
+    rss_slope = slope_per_1000(steady, "rss_bytes")
+    pauses = {generation: {"count": child.count, "total_ms": child.sum * 1000}
+              for generation, child in gc_seconds._children.items()}
+    emit({
+        "benchmark": "memory",
+        "frames": args.frames,
+        "gallery_size": args.size,
+        "faces_per_frame": args.faces,
+        "people": args.people,
+        "gc_per_frame": args.gc_per_frame,
+        "gc_threshold": gc.get_threshold(),
+        "gc_collections": [stats["collections"] - before for stats, before in zip(gc.get_stats(), gc_before)],
+        "gc_pauses": pauses,
+        **percentiles(latencies),
+        "traced_growth_per_1000_frames": slope_per_1000(steady, "traced_bytes"),
+        "rss_growth_per_1000_frames": rss_slope,
+        "flat": rss_slope <= args.max_growth_kb * 1024,
+        "top_growth": growth,
+        "samples": samples,
+        "environment": environment(backend),
+    }, args.out)
+    if rss_slope > args.max_growth_kb * 1024:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
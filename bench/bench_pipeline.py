@@ -0,0 +1,164 @@
+"""Recognition throughput and gallery load time at several gallery sizes.
+
+Frames go through ``main.process_frame`` exactly as a camera's would. By
+default dlib is replaced by a synthetic detector that "finds" ``--faces``
+boxes per frame whose encodings are noisy copies of gallery members, so
+the numbers cover decoding, tracking, matching, attendance and history
+but not HOG/ResNet time. Pass ``--images DIR`` to run real detection on
+photos instead (needs face_recognition).
+
+    python bench/bench_pipeline.py --sizes 100 10000 100000 --frames 200
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+from common import (setup_database, synthetic_encodings, synthetic_frames, seed_users,
+                    percentiles, environment, emit)
+
+FACE_SIZE = 96
+
+
+class SyntheticFaces:
+    """Drop-in for face_recognition's detect/encode calls on synthetic frames."""
+
+    def __init__(self, encodings, faces, seed=0):
+        self.encodings = encodings
+        self.faces = faces
+        self.rng = np.random.default_rng(seed)
+
+    def face_locations(self, img, number_of_times_to_upsample=1, model="hog"):
+        height, width = img.shape[:2]
+        boxes = []
+        for _ in range(self.faces):
+            top = int(self.rng.integers(0, height - FACE_SIZE))
+            left = int(self.rng.integers(0, width - FACE_SIZE))
+            boxes.append((top, left + FACE_SIZE, top + FACE_SIZE, left))
+        return boxes
+
+    def face_encodings(self, img, known_face_locations=None, num_jitters=1, model="small"):
+        rows = self.rng.integers(0, len(self.encodings), len(known_face_locations))
+        noise = self.rng.normal(0, 0.02, (len(rows), self.encodings.shape[1]))
+        return list(self.encodings[rows] + noise)
+
+    def install(self):
+        try:
+            import face_recognition as module
+        except ImportError:
+            # Synthetic runs do not need dlib at all
+            module = sys.modules["face_recognition"] = types.ModuleType("face_recognition")
+        module.face_locations = self.face_locations
+        module.face_encodings = self.face_encodings
+
+
+def load_images(directory, limit):
+    paths = sorted(glob.glob(os.path.join(directory, "*.jp*g")) + glob.glob(os.path.join(directory, "*.png")))
+    frames = []
+    for path in paths[:limit]:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    if not frames:
+        raise SystemExit(f"No .jpg/.png images in {directory}")
+    return frames
+
+
+def stage_totals(histogram):
+    return {stage: (child.sum, child.count) for stage, child in histogram._children.items()}
+
+
+def stage_means(before, after):
+    means = {}
+    for stage, (total, count) in after.items():
+        previous_total, previous_count = before.get(stage, (0.0, 0))
+        if count > previous_count:
+            means[stage] = (total - previous_total) / (count - previous_count) * 1000
+    return means
+
+
+def bench_size(main, size, frames, seed, detector=None):
+    from attendance_utils import load_face_encodings, attendance_buffer
+    from attendance_summary import summary_cache
+    from camera_sessions import CameraSession
+    from metrics import stage_seconds
+
+    main.db.users.drop()
+    main.db.attendance.drop()
+    main.db.attendance_monthly.drop()
+    summary_cache._data.clear()
+    main.state.clear_claims("")
+
+    encodings = synthetic_encodings(size, seed)
+    if detector is not None:
+        # Faces in the frames are people enrolled in this gallery
+        detector.encodings = encodings
+    t0 = time.perf_counter()
+    seed_users(main.db, encodings)
+    seed_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    gallery, errors = load_face_encodings()
+    load_s = time.perf_counter() - t0
+    main.face_encoding_cache = gallery
+
+    session = CameraSession(f"bench-{size}")
+    before = stage_totals(stage_seconds)
+    latencies = []
+    started = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        main.process_frame(session, frame)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    attendance_buffer.flush()
+    return {
+        "gallery_size": size,
+        "seed_s": seed_s,
+        "gallery_load_s": load_s,
+        "gallery_load_errors": errors,
+        "frames": len(frames),
+        "fps": len(frames) / elapsed,
+        **percentiles(latencies),
+        "stage_mean_ms": stage_means(before, stage_totals(stage_seconds)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--faces", type=int, default=2, help="synthetic faces per frame")
+    parser.add_argument("--images", help="directory of real photos to use as frames")
+    parser.add_argument("--mongo-uri", help="scratch MongoDB instead of mongomock (it is dropped!)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    backend = setup_database(args.mongo_uri)
+    detector = None
+    if args.images:
+        frames = load_images(args.images, args.frames)
+    else:
+        # Workers would not see the synthetic detector, so analyse inline
+        os.environ["RECOGNITION_WORKERS"] = "0"
+        detector = SyntheticFaces(None, args.faces, args.seed)
+        detector.install()
+        frames = synthetic_frames(args.frames, seed=args.seed)
+
+    import main as app_main
+    app_main.background_tasks_started = True  # no refresh/flush loops during the run
+    app_main.state.set_flag("running", True)
+    app_main.FRAME_SKIP_MS = 0
+
+    results = [bench_size(app_main, size, frames, args.seed, detector) for size in args.sizes]
+    emit({"benchmark": "pipeline", "detector": "dlib" if args.images else "synthetic",
+          "faces_per_frame": None if args.images else args.faces,
+          "environment": environment(backend), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Shared setup for the offline benchmarks.
+
+The benchmarks import the app modules only after ``setup_database`` has
+pointed them at mongomock (or a throwaway local MongoDB), so they run
+without a camera, credentials or a real deployment.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from face_gallery import ENCODING_DIM  # noqa: E402
+
+
+def setup_database(mongo_uri=None, db_name="facetrace_bench"):
+    """Point config.db at mongomock, or at ``mongo_uri`` when given.
+
+    Must run before any app module is imported. A real database is dropped
+    first, so only ever pass a scratch instance.
+    """
+    os.environ["DB_NAME"] = db_name
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+        import pymongo
+        pymongo.MongoClient(mongo_uri).drop_database(db_name)
+        return "mongodb"
+    import mongomock
+    import pymongo
+    os.environ["MONGO_URI"] = "mongodb://mongomock"
+    client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: client
+    return "mongomock"
+
+
+def synthetic_encodings(count, seed=0):
+    """Encodings with dlib's spread: norm ~1, same-person distance ~0.3."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.08, (32, ENCODING_DIM))
+    encodings = centres[rng.integers(0, len(centres), count)] + rng.normal(0, 0.05, (count, ENCODING_DIM))
+    return encodings.astype(np.float32)
+
+
+def synthetic_frames(count, size=(480, 640), seed=0):
+    """JPEG frames of noise; every frame differs so change gating never skips one."""
+    import cv2
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        image = rng.integers(0, 256, size + (3,), dtype=np.uint8)
+        frames.append(cv2.imencode('.jpg', image)[1].tobytes())
+    return frames
+
+
+def seed_users(db, encodings, batch=5000):
+    """Insert one user per encoding; returns their ids in order."""
+    from encoding_codec import pack_encoding
+    ids = []
+    departments = ("CSE", "EE", "ME", "CE")
+    for start in range(0, len(encodings), batch):
+        docs = [{
+            "name": f"User {i}",
+            "roll_number": str(i),
+            "department": departments[i % len(departments)],
+            "role": "Student",
+            "updated_at": datetime.now(),
+            **pack_encoding(encodings[i]),
+        } for i in range(start, min(start + batch, len(encodings)))]
+        ids.extend(db.users.insert_many(docs).inserted_ids)
+    return ids
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean()),
+    }
+
+
+def environment(backend):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "database": backend,
+    }
+
+
+def emit(results, out=None):
+    """Write results as JSON to ``out`` (a path) or stdout."""
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+    else:
+        json.dump(results, sys.stdout, indent=2, default=str)
+        print()
@@ -0,0 +1,200 @@
+"""Bulk face enrollment from a directory or zip of images with a CSV manifest.
+
+The manifest (``manifest.csv`` at the root by default) has the columns
+name, roll_number, department, role, image. ``image`` is a path relative
+to the root. Several samples of one person can be listed as extra rows
+with the same roll_number or as ``;``-separated paths; their encodings
+are averaged.
+
+    python bulk_enroll.py intake.zip [--manifest manifest.csv] [--workers 8]
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import db
+from detectors import detect_faces, detection_params, encode_faces, largest_face
+from encoding_codec import pack_encoding
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.csv"
+VALID_ROLES = ('Teacher', 'Student')
+# People encoded and inserted per round; bounds memory held in images
+ENROLL_BATCH_SIZE = 64
+
+
+class DirectorySource:
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+
+    def read(self, name):
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep):
+            raise KeyError(name)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class ZipSource:
+    def __init__(self, file):
+        self.archive = zipfile.ZipFile(file)
+
+    def read(self, name):
+        return self.archive.read(name)
+
+
+def open_source(path_or_file):
+    """Image source for a directory path, zip path or open zip file."""
+    if isinstance(path_or_file, str) and os.path.isdir(path_or_file):
+        return DirectorySource(path_or_file)
+    return ZipSource(path_or_file)
+
+
+def read_manifest(text):
+    """Group manifest rows by roll_number. Returns (people, failures)."""
+    people, failures = {}, []
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        roll_number = row.get('roll_number')
+        images = [name.strip() for name in row.get('image', '').split(';') if name.strip()]
+        if not all([row.get('name'), roll_number, row.get('department'), row.get('role'), images]):
+            failures.append({"roll_number": roll_number, "reason": "Missing required fields"})
+            continue
+        if row['role'] not in VALID_ROLES:
+            failures.append({"roll_number": roll_number, "reason": "Invalid role"})
+            continue
+        person = people.setdefault(roll_number, {
+            "name": row['name'], "roll_number": roll_number,
+            "department": row['department'], "role": row['role'], "images": [],
+        })
+        person["images"].extend(images)
+    return people, failures
+
+
+def encode_samples(images):
+    """Mean encoding over a person's sample images, detecting once per image.
+
+    Runs in a worker process. Returns (encoding or None, samples used).
+    """
+    encodings = []
+    for data in images:
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            continue
+        face_locations, _ = detect_faces(frame, *detection_params("register"))
+        if not face_locations:
+            continue
+        # The largest face is the person being enrolled
+        encodings.extend(encode_faces(frame, [largest_face(face_locations)]))
+    if not encodings:
+        return None, 0
+    return np.mean(encodings, axis=0).astype(np.float32), len(encodings)
+
+
+def _read_images(source, names):
+    images = []
+    for name in names:
+        try:
+            images.append(source.read(name))
+        except (KeyError, OSError) as e:
+            logger.warning(f"Missing image {name}: {e}")
+    return images
+
+
+def _insert_users(docs):
+    if not docs:
+        return []
+    try:
+        db.users.insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        failed = set()
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            logger.error(f"Failed to insert {docs[err['index']]['roll_number']}: {err.get('errmsg')}")
+        return [doc for index, doc in enumerate(docs) if index not in failed]
+    except PyMongoError as e:
+        logger.error(f"Failed to insert {len(docs)} users: {e}")
+        return []
+
+
+def executor_map(executor):
+    """``encode_map`` over a concurrent.futures executor; errors are returned per item."""
+    def encode_map(func, items):
+        futures = [executor.submit(func, item) for item in items]
+        return [future.exception() or future.result() for future in futures]
+    return encode_map
+
+
+def enroll(source, encode_map, manifest_name=MANIFEST_NAME, batch_size=ENROLL_BATCH_SIZE):
+    """Register everyone in a source's manifest.
+
+    ``encode_map(func, iterable)`` runs ``encode_samples`` over the image
+    lists, normally across processes, and returns per item its result or
+    the exception it raised, so one bad person does not stop the rest.
+    Returns (inserted user documents, failures).
+    """
+    people, failures = read_manifest(source.read(manifest_name).decode('utf-8-sig'))
+    existing = {
+        u['roll_number'] for u in db.users.find({"roll_number": {"$in": list(people)}}, {"roll_number": 1})
+    }
+    for roll_number in existing:
+        failures.append({"roll_number": roll_number, "reason": "Already registered"})
+    pending = [person for roll, person in people.items() if roll not in existing]
+
+    registered = []
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        results = encode_map(encode_samples, [_read_images(source, p["images"]) for p in batch])
+        docs = []
+        for person, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error(f"Encoding {person['roll_number']} failed: {result}")
+                failures.append({"roll_number": person["roll_number"], "reason": f"Encoding failed: {result}"})
+                continue
+            encoding, samples = result
+            if encoding is None:
+                failures.append({"roll_number": person["roll_number"], "reason": "No face detected"})
+                continue
+            docs.append({
+                "name": person["name"],
+                "roll_number": person["roll_number"],
+                "department": person["department"],
+                "role": person["role"],
+                "sample_count": samples,
+                "updated_at": datetime.now(),
+                **pack_encoding(encoding),
+            })
+        inserted = _insert_users(docs)
+        inserted_rolls = {doc["roll_number"] for doc in inserted}
+        failures.extend({"roll_number": doc["roll_number"], "reason": "Insert failed"}
+                        for doc in docs if doc["roll_number"] not in inserted_rolls)
+        registered.extend(inserted)
+        logger.info(f"Enrolled {len(registered)}/{len(pending)}")
+    return registered, failures
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Bulk face enrollment from a directory or zip of images.")
+    parser.add_argument("source", help="directory or .zip containing the manifest and images")
+    parser.add_argument("--manifest", default=MANIFEST_NAME)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        registered, failures = enroll(open_source(args.source), executor_map(executor),
+                                      manifest_name=args.manifest)
+    for failure in failures:
+        logger.warning(f"{failure['roll_number']}: {failure['reason']}")
+    logger.info(f"Registered {len(registered)} users, {len(failures)} failed.")
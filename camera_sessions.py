@@ -0,0 +1,73 @@
+import os
+import time
+from collections import deque
+
+from detectors import ScalePolicy
+from face_tracker import FaceTracker
+
+# Frames buffered per camera while it is busy; the oldest is dropped first
+FRAME_QUEUE_DEPTH = int(os.getenv("FRAME_QUEUE_DEPTH", 1))
+
+
+class CameraSession:
+    """Recognition pipeline state for one camera.
+
+    Every camera (a Socket.IO room, by default the client's own sid) gets
+    its own frame throttle, tracker and recognition emits, so concurrent
+    classrooms do not drop each other's frames. Presence and emit
+    cooldowns are kept per camera in state_store.
+    """
+
+    def __init__(self, camera_id, scope=None, profile=None):
+        self.camera_id = camera_id
+        # Optional {"department": ..., "role": ...} restricting matching
+        self.scope = scope
+        # Detection backend/resolution, from a profile in detectors.PROFILES
+        self.scale = ScalePolicy(profile)
+        self.sids = set()
+        self.last_frame_process = 0
+        self.tracker = FaceTracker()
+        # Newest frames waiting to be processed
+        self.pending_frames = deque(maxlen=FRAME_QUEUE_DEPTH)
+        self.busy = False
+        self.created_at = time.time()
+
+
+sessions = {}
+camera_of_sid = {}
+
+
+def join_session(sid, camera_id=None, scope=None, profile=None):
+    """Attach a socket to a camera session, creating it on first use."""
+    leave_session(sid)
+    camera_id = camera_id or sid
+    session = sessions.get(camera_id)
+    if session is None:
+        session = sessions[camera_id] = CameraSession(camera_id, scope, profile)
+    else:
+        if scope:
+            session.scope = scope
+        if profile and profile != session.scale.profile:
+            session.scale = ScalePolicy(profile)
+    session.sids.add(sid)
+    camera_of_sid[sid] = camera_id
+    return session
+
+
+def session_for_sid(sid):
+    camera_id = camera_of_sid.get(sid)
+    if camera_id is None:
+        return join_session(sid)
+    return sessions[camera_id]
+
+
+def leave_session(sid):
+    """Detach a socket; the session is dropped once no sockets remain."""
+    camera_id = camera_of_sid.pop(sid, None)
+    session = sessions.get(camera_id)
+    if session is None:
+        return
+    session.sids.discard(sid)
+    if not session.sids:
+        del sessions[camera_id]
+        session.pending_frames.clear()
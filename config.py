@@ -12,6 +12,46 @@ DB_NAME = os.getenv("DB_NAME")
 if not MONGO_URI or not DB_NAME:
     raise ValueError("Missing MONGO_URI or DB_NAME in environment variables")
 
-# Connect to MongoDB
-client = MongoClient(MONGO_URI)
+# Connection pool shared by every module; sized for one eventlet worker
+# where each green thread holds a connection only for the call it makes
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 2))
+# Fail fast instead of stalling the event loop's callers when MongoDB is slow
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+# zstd/snappy need the zstandard/python-snappy packages; zlib is built in
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+
+# Connect to MongoDB. connect=False defers connecting to the first
+# operation, so gunicorn's preloading master never opens sockets that
+# forked workers would inherit.
+client = MongoClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    compressors=MONGO_COMPRESSORS,
+    appname="facetrace",
+    connect=False,
+)
 db = client[DB_NAME]
+
+
+def short_lived_client():
+    """A separate client for one-off work in a process that will fork.
+
+    Use it as a context manager so it is closed before the fork.
+    """
+    return MongoClient(
+        MONGO_URI,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        compressors=MONGO_COMPRESSORS,
+        appname="facetrace-preload",
+    )
@@ -0,0 +1,184 @@
+"""Face detection backends, per-camera detection profiles and adaptive scale.
+
+Faces are detected on a downscaled copy of the frame and encoded from
+crops of the full-resolution frame, so the detection cost follows the
+profile's width while small faces keep all their pixels for encoding.
+
+Backends:
+- ``hog``: dlib's HOG detector via face_recognition (the original behaviour)
+- ``yunet``: OpenCV's YuNet CNN (``cv2.FaceDetectorYN``); needs the ONNX
+  model from opencv_zoo at ``YUNET_MODEL``
+"""
+import logging
+import os
+
+import cv2
+
+from frame_memory import scratch
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "hog")
+DETECTOR_PROFILE = os.getenv("DETECTOR_PROFILE", "default")
+YUNET_MODEL = os.getenv("YUNET_MODEL", "models/face_detection_yunet_2023mar.onnx")
+YUNET_SCORE_THRESHOLD = float(os.getenv("YUNET_SCORE_THRESHOLD", 0.8))
+
+# Faces shorter than this in the detection image are close to what the
+# detectors can find (HOG's 80 px window at upsample 1); the scale grows
+# while faces are this small and shrinks once they are four times bigger
+MIN_FACE_PX = 40
+SCALE_STEP = 1.25
+# Context kept around a face when cropping it for encoding
+CROP_MARGIN = 0.25
+
+# width: detection image width; the scale adapts within [min_width, max_width]
+PROFILES = {
+    # Webcam a metre or two away
+    "default": {"width": 640, "min_width": 480, "max_width": 960, "upsample": 1},
+    # Wide shot of a room; faces at the back are small
+    "classroom": {"width": 960, "min_width": 640, "max_width": 1600, "upsample": 1},
+    # One person close to the camera
+    "kiosk": {"width": 320, "min_width": 240, "max_width": 640, "upsample": 0},
+    # Registration photos: a single face, detected once
+    "register": {"width": 640, "min_width": 640, "max_width": 640, "upsample": 1},
+}
+
+
+def get_profile(name=None):
+    profile = PROFILES.get(name or DETECTOR_PROFILE)
+    if profile is None:
+        logger.warning(f"Unknown detector profile {name!r}, using {DETECTOR_PROFILE!r}")
+        profile = PROFILES.get(DETECTOR_PROFILE, PROFILES["default"])
+    return profile
+
+
+def warm_up():
+    """Import face_recognition, which loads dlib's models (several seconds).
+
+    Everything here imports it lazily so starting the app stays fast;
+    this is run in the background to have the models ready for the
+    first frame.
+    """
+    import face_recognition  # noqa: F401
+
+
+def _detect_hog(image, upsample):
+    import face_recognition
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=scratch("detect_rgb", image.shape))
+    return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=upsample, model="hog")
+
+
+_yunet = None
+
+
+def _detect_yunet(image, upsample):
+    global _yunet
+    if _yunet is None:
+        # One detector per process; the input size is set per image
+        _yunet = cv2.FaceDetectorYN.create(YUNET_MODEL, "", (320, 320), YUNET_SCORE_THRESHOLD)
+    height, width = image.shape[:2]
+    _yunet.setInputSize((width, height))
+    _, faces = _yunet.detect(image)
+    if faces is None:
+        return []
+    boxes = []
+    for x, y, w, h in faces[:, :4]:
+        top, left = max(0, int(y)), max(0, int(x))
+        boxes.append((top, min(width, int(x + w)), min(height, int(y + h)), left))
+    return boxes
+
+
+BACKENDS = {"hog": _detect_hog, "yunet": _detect_yunet}
+
+
+def yunet_available():
+    return hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL)
+
+
+def resolve_backend(name=None):
+    """Backend name to use, falling back to HOG when YuNet cannot run."""
+    name = name or DETECTOR_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {name}")
+    if name == "yunet" and not yunet_available():
+        logger.warning(f"YuNet model not found at {YUNET_MODEL}, using HOG")
+        return "hog"
+    return name
+
+
+def detection_params(profile=None):
+    """(backend, width, upsample) for a profile, for one-off detections."""
+    settings = get_profile(profile)
+    return resolve_backend(settings.get("backend")), settings["width"], settings["upsample"]
+
+
+def largest_face(boxes):
+    return max(boxes, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+
+
+def detect_faces(frame, backend="hog", width=640, upsample=1):
+    """Detect faces on a copy of ``frame`` scaled down to ``width``.
+
+    Returns (boxes as (top, right, bottom, left) in ``frame`` coordinates,
+    face heights in detection-image pixels).
+    """
+    height, frame_width = frame.shape[:2]
+    scale = min(1.0, width / frame_width)
+    if scale < 1.0:
+        size = (round(frame_width * scale), round(height * scale))
+        image = cv2.resize(frame, size, dst=scratch("detect", (size[1], size[0]) + frame.shape[2:]),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        image = frame
+    boxes = BACKENDS[backend](image, upsample)
+    heights = [bottom - top for top, _, bottom, _ in boxes]
+    if scale < 1.0:
+        boxes = [(max(0, int(top / scale)), min(frame_width, int(right / scale)),
+                  min(height, int(bottom / scale)), max(0, int(left / scale)))
+                 for top, right, bottom, left in boxes]
+    return boxes, heights
+
+
+def encode_faces(frame, boxes):
+    """128-d encodings of ``boxes``, each computed on a crop of the BGR ``frame``."""
+    import face_recognition
+    height, width = frame.shape[:2]
+    encodings = []
+    for top, right, bottom, left in boxes:
+        margin = int((bottom - top) * CROP_MARGIN)
+        y0, x0 = max(0, top - margin), max(0, left - margin)
+        y1, x1 = min(height, bottom + margin), min(width, right + margin)
+        crop = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+        location = (top - y0, right - x0, bottom - y0, left - x0)
+        encodings.extend(face_recognition.face_encodings(crop, known_face_locations=[location]))
+    return encodings
+
+
+class ScalePolicy:
+    """Detection settings for one camera, adapted to the faces it sees.
+
+    The detection width grows while the smallest face found is near the
+    detector's limit and shrinks while every face is comfortably large,
+    staying within the profile's bounds.
+    """
+
+    def __init__(self, profile=None):
+        settings = get_profile(profile)
+        self.profile = profile or DETECTOR_PROFILE
+        self.backend = resolve_backend(settings.get("backend"))
+        self.width = settings["width"]
+        self.min_width = settings["min_width"]
+        self.max_width = settings["max_width"]
+        self.upsample = settings["upsample"]
+
+    def params(self):
+        return self.backend, self.width, self.upsample
+
+    def update(self, face_heights):
+        if not face_heights:
+            return
+        smallest = min(face_heights)
+        if smallest < MIN_FACE_PX and self.width < self.max_width:
+            self.width = min(self.max_width, int(self.width * SCALE_STEP))
+        elif smallest > 4 * MIN_FACE_PX and self.width > self.min_width:
+            self.width = max(self.min_width, int(self.width / SCALE_STEP))
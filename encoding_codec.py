@@ -0,0 +1,63 @@
+import os
+import numpy as np
+from bson.binary import Binary
+
+from face_gallery import ENCODING_DIM
+
+# Storage format for new encodings: float32 (lossless for matching),
+# float16 (half size) or int8 (quarter size, per-vector scale)
+ENCODING_FORMAT = os.getenv("ENCODING_FORMAT", "float32").lower()
+ENCODING_FORMATS = ("float32", "float16", "int8")
+
+# Only these fields are read when loading the gallery
+GALLERY_PROJECTION = {
+    "_id": 1, "name": 1, "roll_number": 1, "department": 1, "role": 1,
+    "face_encoding_bin": 1, "encoding_format": 1, "encoding_scale": 1, "updated_at": 1,
+    # Legacy list encodings, absent once migrate_encodings.py has run
+    "face_encoding": 1,
+}
+
+
+def pack_encoding(encoding, fmt=None):
+    """User document fields holding ``encoding`` as a packed binary blob."""
+    fmt = (fmt or ENCODING_FORMAT).lower()
+    encoding = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+    if fmt == "float32":
+        return {"face_encoding_bin": Binary(encoding.tobytes()), "encoding_format": fmt}
+    if fmt == "float16":
+        return {"face_encoding_bin": Binary(encoding.astype('<f2').tobytes()), "encoding_format": fmt}
+    if fmt == "int8":
+        scale = float(np.abs(encoding).max()) / 127 or 1.0
+        quantized = np.clip(np.rint(encoding / scale), -127, 127).astype(np.int8)
+        return {"face_encoding_bin": Binary(quantized.tobytes()), "encoding_format": fmt,
+                "encoding_scale": scale}
+    raise ValueError(f"Unknown encoding format: {fmt}")
+
+
+def unpack_encoding(user, out=None):
+    """Decode a user's encoding into ``out`` (a float32 row) or a new array."""
+    if out is None:
+        out = np.empty(ENCODING_DIM, dtype=np.float32)
+    blob = user.get("face_encoding_bin")
+    if blob is None:
+        values = np.asarray(user["face_encoding"], dtype=np.float32)
+        if values.shape != (ENCODING_DIM,):
+            raise ValueError(f"unexpected encoding shape {values.shape}")
+        out[:] = values
+        return out
+
+    fmt = user.get("encoding_format", "float32")
+    if fmt == "float32":
+        values = np.frombuffer(blob, dtype='<f4')
+    elif fmt == "float16":
+        values = np.frombuffer(blob, dtype='<f2')
+    elif fmt == "int8":
+        values = np.frombuffer(blob, dtype=np.int8)
+    else:
+        raise ValueError(f"Unknown encoding format: {fmt}")
+    if values.shape != (ENCODING_DIM,):
+        raise ValueError(f"unexpected encoding size {values.size}")
+    out[:] = values
+    if fmt == "int8":
+        out *= user["encoding_scale"]
+    return out
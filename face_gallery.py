@@ -0,0 +1,191 @@
+import numpy as np
+
+from matchers import build_matcher, squared_norms
+
+ENCODING_DIM = 128
+SCOPE_FIELDS = ("department", "role")
+# Rebuild storage and indexes once this many removed rows have piled up
+COMPACT_MIN_REMOVED = 256
+COMPACT_REMOVED_RATIO = 0.25
+
+
+class FaceGallery:
+    """In-memory gallery of enrolled faces.
+
+    Encodings are kept in one contiguous float32 N x 128 matrix with
+    parallel id/name/roll arrays so a whole frame can be matched with a
+    single matrix operation. Nearest-neighbour search is delegated to a
+    matcher (see ``matchers.py``); department/role scoped sub-indexes are
+    built on first use.
+
+    Users can be added and removed in place: new rows are appended to
+    spare capacity and removed rows are masked out until enough of them
+    accumulate to be worth compacting.
+    """
+
+    def __init__(self, ids, names, roll_numbers, encodings, departments=None, roles=None,
+                 backend=None):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.roll_numbers = list(roll_numbers)
+        self.departments = list(departments) if departments is not None else [None] * len(self.ids)
+        self.roles = list(roles) if roles is not None else [None] * len(self.ids)
+        encodings = np.asarray(encodings, dtype=np.float32)
+        self._encodings = np.ascontiguousarray(encodings.reshape(-1, ENCODING_DIM))
+        # Squared norms are reused by every match call
+        self._sq_norms = squared_norms(self._encodings)
+        self._active = np.ones(len(self.ids), dtype=bool)
+        self._row_of = {user_id: row for row, user_id in enumerate(self.ids)}
+        self.removed_count = 0
+        # Latest users.updated_at applied to this gallery (see attendance_utils)
+        self.watermark = None
+        self.backend = backend
+        self._build_matchers()
+
+    def _build_matchers(self):
+        self.matcher = build_matcher(self, backend=self.backend)
+        self._scoped_matchers = {}
+
+    def __len__(self):
+        return self.row_count - self.removed_count
+
+    def __contains__(self, user_id):
+        return user_id in self._row_of
+
+    @property
+    def row_count(self):
+        """Rows in use, including removed rows not yet compacted."""
+        return len(self.ids)
+
+    @property
+    def encodings(self):
+        return self._encodings[:self.row_count]
+
+    @property
+    def sq_norms(self):
+        return self._sq_norms[:self.row_count]
+
+    @property
+    def active(self):
+        return self._active[:self.row_count]
+
+    def _grow(self, capacity=None):
+        capacity = capacity or max(16, 2 * len(self._encodings))
+        encodings = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        active = np.zeros(capacity, dtype=bool)
+        count = self.row_count
+        encodings[:count] = self._encodings[:count]
+        sq_norms[:count] = self._sq_norms[:count]
+        active[:count] = self._active[:count]
+        self._encodings, self._sq_norms, self._active = encodings, sq_norms, active
+
+    def reserve(self, rows):
+        """Make room for ``rows`` more users without reallocating.
+
+        A gallery shared copy-on-write by forked processes is reserved
+        before the fork: the spare rows are not touched until used, and a
+        process adding users then copies only the pages it writes instead
+        of the whole matrix.
+        """
+        if self.row_count + rows > len(self._encodings):
+            self._grow(self.row_count + rows)
+
+    def add(self, user_id, name, roll_number, encoding, department=None, role=None):
+        """Insert or replace a user without rebuilding the index."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+        self.remove(user_id)
+        row = self.row_count
+        if row == len(self._encodings):
+            self._grow()
+        self._encodings[row] = encoding
+        self._sq_norms[row] = encoding @ encoding
+        self._active[row] = True
+        self.ids.append(user_id)
+        self.names.append(name)
+        self.roll_numbers.append(roll_number)
+        self.departments.append(department)
+        self.roles.append(role)
+        self._row_of[user_id] = row
+
+        self.matcher.add(row)
+        for key, matcher in self._scoped_matchers.items():
+            if all(self._column(field)[row] == value for field, value in key):
+                matcher.add(row)
+        return row
+
+    def lookup(self, user_id):
+        """(name, roll_number) of a user in the gallery, or None."""
+        row = self._row_of.get(user_id)
+        if row is None:
+            return None
+        return self.names[row], self.roll_numbers[row]
+
+    def remove(self, user_id):
+        """Mask a user out of matching. Returns False if it was not present."""
+        row = self._row_of.pop(user_id, None)
+        if row is None:
+            return False
+        self._active[row] = False
+        self.removed_count += 1
+        if (self.removed_count >= COMPACT_MIN_REMOVED and
+                self.removed_count > self.row_count * COMPACT_REMOVED_RATIO):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Drop removed rows and rebuild the indexes."""
+        keep = np.flatnonzero(self.active)
+        self._encodings = np.ascontiguousarray(self.encodings[keep])
+        self._sq_norms = self.sq_norms[keep]
+        self._active = np.ones(len(keep), dtype=bool)
+        for attr in ("ids", "names", "roll_numbers", "departments", "roles"):
+            column = getattr(self, attr)
+            setattr(self, attr, [column[row] for row in keep])
+        self._row_of = {user_id: row for row, user_id in enumerate(self.ids)}
+        self.removed_count = 0
+        self._build_matchers()
+
+    def _column(self, field):
+        return self.departments if field == "department" else self.roles
+
+    def _scope_key(self, scope):
+        if not scope:
+            return None
+        key = tuple(sorted((field, value) for field, value in scope.items() if value))
+        for field, _ in key:
+            if field not in SCOPE_FIELDS:
+                raise ValueError(f"Unsupported scope field: {field}")
+        return key or None
+
+    def _scope_rows(self, key):
+        mask = self.active.copy()
+        for field, value in key:
+            mask &= np.array([v == value for v in self._column(field)], dtype=bool)
+        return np.flatnonzero(mask)
+
+    def matcher_for(self, scope=None):
+        """Matcher over the whole gallery or a department/role subset."""
+        key = self._scope_key(scope)
+        if key is None:
+            return self.matcher
+        matcher = self._scoped_matchers.get(key)
+        if matcher is None:
+            matcher = build_matcher(self, rows=self._scope_rows(key), backend=self.backend)
+            self._scoped_matchers[key] = matcher
+        return matcher
+
+    def match(self, face_encodings, tolerance=0.5, scope=None):
+        """Best gallery index and distance per face.
+
+        Returns two arrays of length M. The index is -1 where the closest
+        user is not within ``tolerance``. ``scope`` optionally restricts the
+        search, e.g. ``{"department": "CSE"}``.
+        """
+        if len(face_encodings) == 0 or len(self) == 0:
+            count = len(face_encodings)
+            return np.full(count, -1, dtype=np.intp), np.full(count, np.inf, dtype=np.float32)
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        best, best_dist = self.matcher_for(scope).search(queries)
+        best[best_dist >= tolerance] = -1
+        return best, best_dist
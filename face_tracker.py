@@ -0,0 +1,123 @@
+import os
+
+import cv2
+
+from frame_memory import scratch
+
+# Mean absolute grey-level difference (0-255) on the thumbnail below which a
+# frame counts as unchanged and detection is skipped
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", 3.0))
+THUMBNAIL_SIZE = (32, 24)
+# Run detection at least this often even when the scene looks still
+MAX_GATED_SECONDS = 5
+# A detection overlapping a track by this much is the same face
+TRACK_IOU = 0.3
+# An identified track is re-encoded when its box moves this much...
+REENCODE_IOU = 0.6
+# ...or when its identity is older than this
+REENCODE_SECONDS = float(os.getenv("REENCODE_SECONDS", 3))
+
+
+def frame_thumbnail(frame):
+    """Tiny greyscale copy of a BGR frame used for change detection."""
+    grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=scratch("grey", frame.shape[:2]))
+    # The thumbnail is kept as the next frame's reference: a fresh array
+    return cv2.resize(grey, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def frame_changed(reference, thumbnail, threshold=MOTION_THRESHOLD):
+    if reference is None or reference.shape != thumbnail.shape:
+        return True
+    return float(cv2.absdiff(reference, thumbnail).mean()) > threshold
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    intersection = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def plan_encodings(boxes, tracks):
+    """Match detected boxes to known tracks and decide which need encoding.
+
+    ``tracks`` is a list of (box, stale) pairs from FaceTracker.snapshot.
+    Returns (track index or -1 per box, encode flag per box).
+    """
+    pairs = []
+    for i, box in enumerate(boxes):
+        for j, (track_box, _) in enumerate(tracks):
+            overlap = box_iou(box, track_box)
+            if overlap >= TRACK_IOU:
+                pairs.append((overlap, i, j))
+    matched = [-1] * len(boxes)
+    encode = [True] * len(boxes)
+    used = set()
+    # Greedy: best overlaps claim their track first
+    for overlap, i, j in sorted(pairs, reverse=True):
+        if matched[i] >= 0 or j in used:
+            continue
+        matched[i] = j
+        used.add(j)
+        encode[i] = tracks[j][1] or overlap < REENCODE_IOU
+    return matched, encode
+
+
+class Track:
+    def __init__(self, box, identity, encoded_at):
+        self.box = box
+        # (user_id, name, roll_number), or None for an unknown face
+        self.identity = identity
+        self.encoded_at = encoded_at
+
+
+class FaceTracker:
+    """Faces seen by one camera, carried between frames.
+
+    Lets the recognition workers skip frames that did not change and reuse
+    the identity of faces that have barely moved since they were encoded.
+    """
+
+    def __init__(self):
+        self.reference = None
+        self.detected_at = 0
+        self.tracks = []
+
+    def gate_reference(self, now):
+        """Thumbnail to compare the next frame against, or None to force detection."""
+        if now - self.detected_at > MAX_GATED_SECONDS:
+            return None
+        return self.reference
+
+    def snapshot(self, now):
+        return [(track.box, now - track.encoded_at > REENCODE_SECONDS) for track in self.tracks]
+
+    def identities(self):
+        return [track.identity for track in self.tracks]
+
+    def update(self, analysis, new_identities, now):
+        """Replace the tracks with the faces of an analysed frame.
+
+        ``new_identities`` holds one entry per face that was encoded, in
+        order; the rest inherit the identity of their matched track.
+        Returns the identity of every face in the frame.
+        """
+        new_identities = iter(new_identities)
+        tracks = []
+        for box, track_index, encoded in zip(analysis["locations"], analysis["tracks"],
+                                             analysis["encoded"]):
+            if encoded:
+                track = Track(box, next(new_identities), now)
+            else:
+                previous = self.tracks[track_index]
+                track = Track(box, previous.identity, previous.encoded_at)
+            tracks.append(track)
+        self.tracks = tracks
+        self.reference = analysis["thumbnail"]
+        self.detected_at = now
+        return self.identities()
@@ -0,0 +1,67 @@
+"""Allocation discipline for the frame path.
+
+A process analyses one frame at a time (inline on the event loop, or in a
+recognition/video worker), so the intermediate images of one frame can be
+written into the arrays left over from the previous one instead of
+allocating new ones. Buffers are per process and keyed by shape, so
+cameras with the same resolution share them. Only intermediates that do
+not outlive the call may use a scratch buffer.
+
+Garbage collection is tuned instead of forced: numpy arrays are freed by
+reference counting as soon as a frame is done, so the cyclic collector
+only has to look at the small dicts and lists a frame leaves behind.
+"""
+import gc
+import os
+import time
+
+import numpy as np
+
+# Young-generation threshold; the default (700) runs a collection every
+# few frames once the per-frame dicts, lists and tuples add up
+GC_GEN0_THRESHOLD = int(os.getenv("GC_GEN0_THRESHOLD", 10000))
+# Distinct (name, shape) buffers kept before starting over
+MAX_SCRATCH_BUFFERS = 32
+
+_scratch = {}
+
+
+def scratch(name, shape, dtype=np.uint8):
+    """A reusable array for an intermediate image; contents are undefined."""
+    key = (name, tuple(shape), dtype)
+    buffer = _scratch.get(key)
+    if buffer is None:
+        if len(_scratch) >= MAX_SCRATCH_BUFFERS:
+            _scratch.clear()
+        buffer = _scratch[key] = np.empty(shape, dtype)
+    return buffer
+
+
+def configure_gc():
+    """Raise the young-generation threshold; older generations keep their ratios."""
+    _, gen1, gen2 = gc.get_threshold()
+    gc.set_threshold(GC_GEN0_THRESHOLD, gen1, gen2)
+
+
+def freeze_startup_objects():
+    """Move everything allocated so far out of the collector's reach.
+
+    Run once startup work (imports, gallery preload) is done: collections
+    then skip those objects, and workers forked afterwards do not copy
+    their pages by touching GC headers.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def track_gc_pauses(histogram):
+    """Observe every collection's duration in ``histogram``, labelled by generation."""
+    started = {}
+
+    def callback(phase, info):
+        if phase == "start":
+            started["at"] = time.perf_counter()
+        elif "at" in started:
+            histogram.labels(str(info["generation"])).observe(time.perf_counter() - started.pop("at"))
+
+    gc.callbacks.append(callback)
@@ -0,0 +1,151 @@
+import base64
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detectors import detect_faces, encode_faces
+from face_gallery import ENCODING_DIM
+from face_tracker import frame_thumbnail, frame_changed, plan_encodings
+from frame_memory import scratch
+
+# Frames are decoded and kept up to this width; faces are encoded from it
+# while detection runs on a smaller copy (see detectors.py)
+MAX_FRAME_WIDTH = int(os.getenv("MAX_FRAME_WIDTH", 1280))
+DEFAULT_DETECTION = ("hog", 640, 1)
+
+# JPEG start-of-frame markers carrying the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Decoder-side downscale flags, largest reduction first
+_REDUCED_MODES = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG header, or None if ``data`` is not a JPEG."""
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 9 < len(view):
+        if view[pos] != 0xFF:
+            return None
+        marker = view[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        length = (view[pos + 2] << 8) | view[pos + 3]
+        if marker in _JPEG_SOF_MARKERS:
+            height = (view[pos + 5] << 8) | view[pos + 6]
+            width = (view[pos + 7] << 8) | view[pos + 8]
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def decode_image(data, max_width=MAX_FRAME_WIDTH):
+    """Decode encoded image bytes into a BGR image.
+
+    Large JPEGs are downscaled inside the decoder (IMREAD_REDUCED_*) by the
+    biggest power of two that keeps the width at or above ``max_width``.
+    Faces are encoded from the decoded frame, so ``max_width`` is the
+    encoding resolution, not the detection width: at the default 1280 only
+    sources 2560 px or wider are reduced, and webcam frames decode in full.
+    """
+    flags = cv2.IMREAD_COLOR
+    size = jpeg_size(data)
+    if size is not None:
+        for factor, mode in _REDUCED_MODES:
+            if size[0] // factor >= max_width:
+                flags = mode
+                break
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+
+
+def decode_frame(frame_data, timings=None):
+    """Decode a frame sent as raw image bytes or a legacy base64 data URL."""
+    start = time.perf_counter()
+    if isinstance(frame_data, str):
+        frame_data = base64.b64decode(frame_data.split(',')[1])
+        start = _lap(timings, "base64", start)
+    frame = decode_image(frame_data)
+    if frame is None:
+        raise ValueError("Could not decode frame")
+    _lap(timings, "imdecode", start)
+    return frame
+
+
+def limit_width(frame, max_width=MAX_FRAME_WIDTH, reuse=False):
+    """Cap the working resolution of a decoded frame.
+
+    With ``reuse`` the result is written into this process's scratch
+    buffer, for frames that are done with before the next one arrives.
+    """
+    height, width = frame.shape[:2]
+    if width <= max_width:
+        return frame
+    scale = max_width / width
+    size = (int(width * scale), int(height * scale))
+    dst = scratch("frame", (size[1], size[0]) + frame.shape[2:]) if reuse else None
+    return cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+
+
+def _lap(timings, stage, start):
+    """Record the seconds since ``start`` under ``stage``; returns now."""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = now - start
+    return now
+
+
+def analyze_frame(frame_data, reference=None, tracks=(), detection=DEFAULT_DETECTION):
+    """CPU-heavy part of recognition: decode, detect and encode faces.
+
+    Runs in a recognition worker process (see recognition_pool.py) or
+    inline when no workers are configured. ``reference`` and ``tracks``
+    come from the camera's FaceTracker: a frame that barely differs from
+    ``reference`` is not analysed further (``unchanged``), and faces that
+    still overlap a fresh track are not re-encoded. ``detection`` is the
+    camera's (backend, width, upsample) from its ScalePolicy.
+
+    Returns a dict with the frame ``thumbnail``, ``locations`` of all
+    faces, the matched track index per face (``tracks``), which faces were
+    ``encoded`` and their ``encodings`` as a float32 array.
+    ``face_heights`` are in detection-image pixels, for the scale policy;
+    ``timings`` holds the seconds spent per stage, for metrics.
+    """
+    timings = {}
+    frame = decode_frame(frame_data, timings)
+    start = time.perf_counter()
+
+    frame = limit_width(frame, reuse=True)
+    start = _lap(timings, "resize", start)
+
+    thumbnail = frame_thumbnail(frame)
+    if not frame_changed(reference, thumbnail):
+        _lap(timings, "gate", start)
+        return {"unchanged": True, "timings": timings}
+    start = _lap(timings, "gate", start)
+
+    face_locations, face_heights = detect_faces(frame, *detection)
+    start = _lap(timings, "detect", start)
+    matched, encode = plan_encodings(face_locations, tracks)
+    to_encode = [box for box, needed in zip(face_locations, encode) if needed]
+    if to_encode:
+        encodings = encode_faces(frame, to_encode)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    else:
+        encodings = np.empty((0, ENCODING_DIM), dtype=np.float32)
+    _lap(timings, "encode", start)
+
+    return {
+        "unchanged": False,
+        "thumbnail": thumbnail,
+        "locations": face_locations,
+        "face_heights": face_heights,
+        "tracks": matched,
+        "encoded": encode,
+        "encodings": encodings,
+        "timings": timings,
+    }
@@ -0,0 +1,104 @@
+"""Local snapshot of the face gallery for fast restarts.
+
+One file holds a JSON header (ids, names, roll numbers, scopes and the
+DB watermark) followed by the float32 encodings matrix. A restarted
+worker memory-maps the matrix copy-on-write instead of reading every
+user from MongoDB, then fetches only the changes made after the
+watermark (attendance_utils.apply_face_encoding_changes).
+"""
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from face_gallery import FaceGallery, ENCODING_DIM
+from schema import USER_DELETIONS_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+GALLERY_SNAPSHOT_PATH = os.getenv(
+    "GALLERY_SNAPSHOT_PATH",
+    os.path.join(tempfile.gettempdir(), f"facetrace-gallery-{os.getenv('DB_NAME', 'default')}.bin"))
+# Refreshes that changed the gallery rewrite the snapshot at most this often
+GALLERY_SNAPSHOT_SECONDS = int(os.getenv("GALLERY_SNAPSHOT_SECONDS", 300))
+SNAPSHOT_MAGIC = b"FTGALv1\0"
+# Encodings start on a page boundary so they map cleanly
+_ALIGN = 4096
+
+
+def save_snapshot(gallery, path=None):
+    """Write the active rows of ``gallery``; the file is replaced atomically."""
+    path = path or GALLERY_SNAPSHOT_PATH
+    rows = np.flatnonzero(gallery.active)
+    header = json.dumps({
+        "rows": len(rows),
+        "watermark": gallery.watermark.isoformat() if gallery.watermark else None,
+        "saved_at": time.time(),
+        "ids": [gallery.ids[r] for r in rows],
+        "names": [gallery.names[r] for r in rows],
+        "roll_numbers": [gallery.roll_numbers[r] for r in rows],
+        "departments": [gallery.departments[r] for r in rows],
+        "roles": [gallery.roles[r] for r in rows],
+    }).encode('utf-8')
+    prefix = SNAPSHOT_MAGIC + struct.pack("<Q", len(header)) + header
+    padding = -len(prefix) % _ALIGN
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(prefix + b"\0" * padding)
+            f.write(np.ascontiguousarray(gallery.encodings[rows], dtype=np.float32).tobytes())
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not write gallery snapshot {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def load_snapshot(path=None, backend=None):
+    """Gallery from a snapshot, or None if there is no usable one.
+
+    Snapshots older than the user_deletions TTL are ignored: deletions
+    made since then can no longer be replayed.
+    """
+    path = path or GALLERY_SNAPSHOT_PATH
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                logger.warning(f"Ignoring gallery snapshot {path}: unknown format")
+                return None
+            (header_length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable gallery snapshot {path}: {e}")
+        return None
+    try:
+        if time.time() - header["saved_at"] > USER_DELETIONS_TTL_SECONDS or not header["watermark"]:
+            return None
+        offset = len(SNAPSHOT_MAGIC) + 8 + header_length
+        offset += -offset % _ALIGN
+        rows = header["rows"]
+        expected_size = offset + rows * ENCODING_DIM * 4
+        if os.path.getsize(path) != expected_size:
+            raise ValueError(f"{os.path.getsize(path)} bytes, expected {expected_size}")
+        if rows:
+            # Copy-on-write: pages are shared with the page cache until written
+            encodings = np.memmap(path, dtype=np.float32, mode="c", offset=offset, shape=(rows, ENCODING_DIM))
+        else:
+            encodings = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        gallery = FaceGallery(header["ids"], header["names"], header["roll_numbers"], encodings,
+                              header["departments"], header["roles"], backend=backend)
+        gallery.watermark = datetime.fromisoformat(header["watermark"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # Truncated or damaged: fall back to a full load
+        logger.warning(f"Ignoring damaged gallery snapshot {path}: {e}")
+        return None
+    return gallery
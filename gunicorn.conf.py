@@ -1,22 +1,38 @@
 # Gunicorn configuration for production deployment
 import os
 
+from dotenv import load_dotenv
+
+# Evaluated before the app is imported; read .env here too so the checks
+# below see the same settings the app will
+load_dotenv()
+
 # Server socket - Render provides PORT environment variable
 port = os.environ.get('PORT', 5000)
 bind = f"0.0.0.0:{port}"
 backlog = 2048
 
 # Worker processes
-workers = 1  # Single worker for face recognition to avoid memory issues
+# Recognition state is shared through state_store (STATE_BACKEND=redis) and
+# emits through SOCKETIO_MESSAGE_QUEUE, so several workers can run; each
+# client must stay on one worker, which holds because the dashboard only
+# uses the websocket transport (no polling requests to route)
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+if workers > 1 and (os.environ.get('STATE_BACKEND', 'memory') != 'redis'
+                    or not os.environ.get('SOCKETIO_MESSAGE_QUEUE')):
+    # Per-process state would split the on/off flag and cooldowns between
+    # workers, and emits would miss clients connected to other workers
+    raise RuntimeError(f"WEB_CONCURRENCY={workers} needs STATE_BACKEND=redis and SOCKETIO_MESSAGE_QUEUE; "
+                       "set them or run a single worker")
+# Face detection/encoding runs in recognition worker processes, never on the
+# event loop; by default each web worker gets an equal share of the cores,
+# leaving one for the web processes themselves
+os.environ.setdefault('RECOGNITION_WORKERS', str(max(1, ((os.cpu_count() or 2) - 1) // workers)))
 worker_class = "eventlet"
 worker_connections = 1000
 timeout = 120
 keepalive = 2
 
-# Restart workers after this many requests, to help prevent memory leaks
-max_requests = 1000
-max_requests_jitter = 100
-
 # Logging
 accesslog = "-"
 errorlog = "-"
@@ -29,4 +45,26 @@ proc_name = 'facetrace-app'
 preload_app = True
 
 # Render-specific optimizations
-bind_unix_socket = None  # Use TCP socket for cloud deployment
\ No newline at end of file
+bind_unix_socket = None  # Use TCP socket for cloud deployment
+
+def when_ready(server):
+    """Load the face gallery once in the master; workers share it copy-on-write."""
+    if server.cfg.preload_app:
+        from main import preload_gallery
+        from frame_memory import freeze_startup_objects
+        preload_gallery()
+        # Keeps workers' collections from touching (and copying) the shared pages
+        freeze_startup_objects()
+
+def post_worker_init(worker):
+    """Create missing MongoDB indexes and warm up recognition in the background."""
+    from schema import ensure_indexes
+    from main import socketio, warm_up_recognition
+    # Off the boot path: a slow or unreachable MongoDB must not stop the worker
+    socketio.start_background_task(ensure_indexes)
+    socketio.start_background_task(warm_up_recognition)
+
+def worker_exit(server, worker):
+    """Flush buffered attendance records before a worker goes away."""
+    from attendance_utils import attendance_buffer
+    attendance_buffer.flush()
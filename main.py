@@ -1,26 +1,37 @@
 # CRITICAL: eventlet monkey patch MUST be first, before any other imports
 import eventlet
 eventlet.monkey_patch()
+from eventlet import tpool
 
 import os
-from flask import Flask, render_template, request, jsonify, send_file
-from flask_socketio import SocketIO
-import cv2
-import face_recognition
-import numpy as np
-import pandas as pd
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from flask_socketio import SocketIO, join_room, leave_room
 from datetime import datetime, date, timedelta
-import io
+import atexit
 import time
 import logging
 import base64
-import gc
 from bson import ObjectId
-from pymongo import MongoClient
+from config import db, DB_NAME, short_lived_client
 from dotenv import load_dotenv
 
-from attendance_utils import load_face_encodings, record_attendance
-from user_utils import register_user, get_user_history
+from attendance_utils import (load_gallery, apply_face_encoding_changes,
+                              add_user_to_gallery, record_attendance, attendance_buffer,
+                              ATTENDANCE_FLUSH_SECONDS, ATTENDANCE_DEDUP_SECONDS)
+from user_utils import register_user, encode_registration, get_user_history, parse_history_cursor, HISTORY_PAGE_SIZE
+from attendance_summary import get_user_summary, forget_user
+from attendance_export import export_rows, parse_export_filters, parquet_available, stream_csv, stream_parquet
+from camera_sessions import sessions, join_session, session_for_sid, leave_session
+from state_store import state, STATE_BACKEND
+from attendance_feed import AttendanceFeed, load_recent_attendance
+from gallery_snapshot import save_snapshot, GALLERY_SNAPSHOT_SECONDS
+from recognition_pool import RECOGNITION_WORKERS, RecognitionPool, analyze, get_recognition_pool
+from bulk_enroll import enroll, open_source
+from detectors import warm_up
+from schema import ensure_indexes, explain_hot_queries
+import metrics
+from metrics import stage_seconds, frame_seconds, frames_total, gallery_load_seconds, gc_seconds
+from frame_memory import configure_gc, track_gc_pauses
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -29,158 +40,319 @@ logger = logging.getLogger(__name__)
 # Load .env
 load_dotenv()
 
+# No forced collections on the frame path; fewer, cheaper automatic ones
+configure_gc()
+track_gc_pauses(gc_seconds)
+
 # Flask setup
 app = Flask(__name__)
-socketio = SocketIO(app, async_mode='eventlet')
-
-# MongoDB setup
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-
-# Global state
-running = False
-last_attendance = {}
-last_recognized = {}
-current_users = {}
+# With several workers or instances, emits go through a message queue
+# (e.g. redis://...) so they reach sockets held by other processes
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or None
+socketio = SocketIO(app, async_mode='eventlet', message_queue=SOCKETIO_MESSAGE_QUEUE)
+
+# MongoDB: the shared, configured client from config.py
+
+# Process-local state; cross-worker state lives in state_store, per-camera
+# state in camera_sessions
 face_encoding_cache = None
 face_encoding_cache_timestamp = 0
-CACHE_TIMEOUT = 300
-last_frame_process = 0
-FRAME_SKIP_MS = 1000  # Process only every 1000ms (1 second)
+# Latest attendance for /history and subscribed dashboards
+history_feed = AttendanceFeed()
+HISTORY_ROOM = 'history'
+background_tasks_started = False
+MAX_HISTORY_PAGE_SIZE = 500
+GALLERY_REFRESH_SECONDS = int(os.getenv("GALLERY_REFRESH_SECONDS", 30))
+# Rows kept free in a preloaded gallery (at least a quarter of its size) so
+# users added after the fork do not make each worker copy the whole matrix
+GALLERY_SPARE_ROWS = int(os.getenv("GALLERY_SPARE_ROWS", 1024))
+# Process each camera at most every FRAME_SKIP_MS (default 1 second)
+FRAME_SKIP_MS = int(os.getenv("FRAME_SKIP_MS", 1000))
+# A recognized user is emitted again per camera after this long
+RECOGNITION_EMIT_SECONDS = 300
+# A user counts as present until not seen for this long
+PRESENCE_SECONDS = 30
+# Processes encoding a /bulk_register upload when there are no recognition workers
+BULK_ENROLL_WORKERS = int(os.getenv("BULK_ENROLL_WORKERS", os.cpu_count() or 1))
+# Frames processed at once across all cameras; waiting cameras are served in turn
+MAX_CONCURRENT_FRAMES = int(os.getenv("MAX_CONCURRENT_FRAMES", max(1, RECOGNITION_WORKERS)))
+frame_slots = eventlet.semaphore.Semaphore(MAX_CONCURRENT_FRAMES)
+
+metrics.Gauge("facetrace_gallery_size", "Users in the face gallery.",
+              lambda: len(face_encoding_cache) if face_encoding_cache is not None else 0)
+metrics.Gauge("facetrace_camera_sessions", "Active camera sessions.", lambda: len(sessions))
+metrics.Gauge("facetrace_attendance_pending", "Attendance records waiting to be written.",
+              lambda: len(attendance_buffer))
 
 @app.before_request
 def log_request_info():
     logger.info(f"{request.method} {request.path} - form: {request.form.to_dict()} - args: {request.args.to_dict()}")
 
+def start_background_tasks():
+    """Start the per-worker loops once, on the first frame (never in gunicorn's master)."""
+    global background_tasks_started
+    if background_tasks_started:
+        return
+    background_tasks_started = True
+    socketio.start_background_task(refresh_face_encodings)
+    socketio.start_background_task(flush_attendance)
+
+def reload_face_encodings():
+    """Full gallery load; on a DB error the gallery is empty with no watermark."""
+    global face_encoding_cache, face_encoding_cache_timestamp
+    started = time.perf_counter()
+    face_encoding_cache, errors = load_gallery()
+    face_encoding_cache_timestamp = time.time()
+    gallery_load_seconds.set(time.perf_counter() - started)
+    if errors > 0:
+        logger.warning(f"{errors} face encodings failed to load.")
+
 def get_face_encodings():
+    if face_encoding_cache is None:
+        reload_face_encodings()
+    start_background_tasks()
+    return face_encoding_cache
+
+def warm_up_recognition():
+    """Load dlib's models and start the recognition pool before the first frame."""
+    # A native thread, so the event loop keeps serving while dlib loads
+    tpool.execute(warm_up)
+    get_recognition_pool()
+    logger.info("Face recognition warmed up.")
+
+def preload_gallery():
+    """Load the gallery before gunicorn forks its workers.
+
+    Called from the master (gunicorn.conf.py ``when_ready``) with
+    ``preload_app``: the encodings matrix and default matcher are then
+    shared copy-on-write by every worker instead of each loading its own
+    copy. Workers only apply changes made after the watermark. Uses a
+    short-lived client so no connection crosses the fork.
+    """
     global face_encoding_cache, face_encoding_cache_timestamp
-    current_time = time.time()
-    if (face_encoding_cache is None or 
-        current_time - face_encoding_cache_timestamp > CACHE_TIMEOUT):
-        if face_encoding_cache:
-            face_encoding_cache = None
-            gc.collect()
-        face_encoding_cache, errors = load_face_encodings()
-        face_encoding_cache_timestamp = current_time
+    started = time.perf_counter()
+    with short_lived_client() as client:
+        gallery, errors = load_gallery(client[DB_NAME])
+    gallery.reserve(max(GALLERY_SPARE_ROWS, len(gallery) // 4))
+    gallery.matcher_for(None)
+    face_encoding_cache = gallery
+    face_encoding_cache_timestamp = time.time()
+    gallery_load_seconds.set(time.perf_counter() - started)
+    logger.info(f"Preloaded {len(gallery)} face encodings ({errors} failed).")
+
+def get_history_feed():
+    """The attendance feed, seeded from MongoDB on first use."""
+    if not history_feed.seeded:
+        history_feed.replace(load_recent_attendance(get_face_encodings(), history_feed.size))
+    return history_feed
+
+def publish_attendance(user_id, name, roll_number, timestamp):
+    """Add a recorded attendance to the feed and push it to dashboards."""
+    entry = get_history_feed().add(user_id, name, roll_number, timestamp)
+    socketio.emit('attendance_event', entry, to=HISTORY_ROOM)
+
+def refresh_face_encodings():
+    """Background loop applying users registered/deleted by other processes."""
+    global face_encoding_cache_timestamp
+    snapshot_at = time.time()
+    while True:
+        socketio.sleep(GALLERY_REFRESH_SECONDS)
+        if face_encoding_cache is None or face_encoding_cache.watermark is None:
+            # The last full load failed; changes alone cannot rebuild the gallery
+            reload_face_encodings()
+            if face_encoding_cache.watermark is not None:
+                logger.info(f"Reloaded {len(face_encoding_cache)} face encodings.")
+            continue
+        applied, errors = apply_face_encoding_changes(face_encoding_cache)
+        face_encoding_cache_timestamp = time.time()
+        if STATE_BACKEND != "memory" and history_feed.seeded:
+            # Other workers record attendance too; pick up what they wrote
+            try:
+                history_feed.replace(load_recent_attendance(face_encoding_cache, history_feed.size))
+            except Exception as e:
+                logger.error(f"History feed resync failed: {e}")
+        if applied:
+            logger.info(f"Applied {applied} face gallery changes.")
+            if time.time() - snapshot_at > GALLERY_SNAPSHOT_SECONDS:
+                save_snapshot(face_encoding_cache)
+                snapshot_at = time.time()
         if errors > 0:
             logger.warning(f"{errors} face encodings failed to load.")
-    return face_encoding_cache
 
-def process_frame(frame_data):
-    global last_frame_process
+def flush_attendance():
+    """Background loop writing buffered attendance records."""
+    while True:
+        socketio.sleep(ATTENDANCE_FLUSH_SECONDS)
+        attendance_buffer.flush()
+
+# Write whatever is still buffered when the process exits
+atexit.register(attendance_buffer.flush)
+
+def process_frame(session, frame_data):
     current_time = time.time() * 1000  # milliseconds
-    
-    # Skip frames if processing too frequently
-    if current_time - last_frame_process < FRAME_SKIP_MS:
+
+    # Skip frames if this camera is processing too frequently
+    if current_time - session.last_frame_process < FRAME_SKIP_MS:
+        frames_total.labels("throttled").inc()
         return
-    
-    last_frame_process = current_time
-    
-    try:
-        img_data = base64.b64decode(frame_data.split(',')[1])
-        nparray = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparray, cv2.IMREAD_COLOR)
-        
-        # Resize frame for faster processing
-        height, width = frame.shape[:2]
-        if width > 640:
-            scale = 640 / width
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            frame = cv2.resize(frame, (new_width, new_height))
-        
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Use faster HOG model instead of CNN
-        face_locations = face_recognition.face_locations(rgb_frame, model="hog")
 
+    session.last_frame_process = current_time
+    frame_started = time.perf_counter()
+    frames_total.labels("processed").inc()
+    room = session.camera_id
+
+    try:
+        running = state.get_flag("running")
         known_faces = get_face_encodings()
         if known_faces is None or len(known_faces) == 0:
             if running:
                 socketio.emit('recognition_status', {
                     'status': 'error',
                     'message': 'No known users found or face encodings missing'
-                })
+                }, to=room)
             return
 
-        if not face_locations:
+        tracker = session.tracker
+        now = time.time()
+        started = time.perf_counter()
+        analysis = analyze(frame_data, tracker.gate_reference(now), tracker.snapshot(now),
+                           session.scale.params())
+        mark = time.perf_counter()
+        worker_time = 0.0
+        for stage, seconds in analysis["timings"].items():
+            stage_seconds.labels(stage).observe(seconds)
+            worker_time += seconds
+        # Waiting for a worker plus pickling the frame and result
+        stage_seconds.labels("ipc").observe(max(0.0, mark - started - worker_time))
+        if analysis["unchanged"]:
+            # Same scene as the last analysed frame: the same faces are present
+            frames_total.labels("unchanged").inc()
+            identities = tracker.identities()
+        else:
+            frames_total.labels("analyzed").inc()
+            best_indices, _ = known_faces.match(analysis["encodings"], tolerance=0.5, scope=session.scope)
+            new_identities = [
+                (known_faces.ids[i], known_faces.names[i], known_faces.roll_numbers[i]) if i >= 0 else None
+                for i in best_indices
+            ]
+            identities = tracker.update(analysis, new_identities, now)
+            session.scale.update(analysis["face_heights"])
+            stage_seconds.labels("match").observe(time.perf_counter() - mark)
+
+        if not identities:
             if running:
                 socketio.emit('recognition_status', {
                     'status': 'no-face',
                     'message': 'No face detected - Please position your face in the frame'
-                })
+                }, to=room)
             return
 
-        known_encodings = [data["encoding"] for data in known_faces.values()]
-        known_names = [data["name"] for data in known_faces.values()]
-        known_ids = list(known_faces.keys())
-        known_roll_numbers = [data["roll_number"] for data in known_faces.values()]
-        detected_users = set()
         face_recognized = False
 
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-        for face_encoding in face_encodings:
-            # Use higher tolerance for faster matching
-            matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=0.5)
-            if True in matches:
-                distances = face_recognition.face_distance(known_encodings, face_encoding)
-                best_match_index = np.argmin(distances)
-                if matches[best_match_index] and distances[best_match_index] < 0.5:
-                    user_id = known_ids[best_match_index]
-                    name = known_names[best_match_index]
-                    roll_number = known_roll_numbers[best_match_index]
-                    detected_users.add(user_id)
-                    face_recognized = True
-                    if running:
-                        should_record = user_id not in last_attendance or (datetime.now() - last_attendance[user_id]).total_seconds() > 60
-                        current_users[user_id] = datetime.now()
-                        should_emit = (user_id not in last_recognized or 
-                                       (datetime.now() - last_recognized[user_id]).total_seconds() > 300)
-                        if should_record:
-                            record_attendance(user_id, last_attendance)
-                        if should_emit:
-                            user_data = get_user_history(str(user_id))
-                            if not user_data or 'error' in user_data:
-                                logger.warning(f"Failed to get history for user {user_id}")
-                                continue
-                            data = {
-                                'name': name,
-                                'roll_number': roll_number,
-                                'user_id': str(user_id),
-                                'history': user_data.get('history', []),
-                                'attendance_percentage': user_data.get('attendance_percentage', 0),
-                                'attended_dates': user_data.get('attended_dates', []),
-                                'department': user_data.get('department', ''),
-                                'role': user_data.get('role', '')
-                            }
-                            socketio.emit('user_recognized', data)
-                            last_recognized[user_id] = datetime.now()
+        for identity in identities:
+            if identity is None:
+                continue
+            user_id, name, roll_number = identity
+            face_recognized = True
+            if running:
+                state.mark_present(room, user_id)
+                # Claims are shared by all workers, so each user is recorded
+                # and announced once even when cameras live in different ones
+                if state.claim(f"attendance:{user_id}", ATTENDANCE_DEDUP_SECONDS):
+                    with stage_seconds.time("db_write"):
+                        recorded_at = record_attendance(user_id)
+                    if recorded_at is not None:
+                        publish_attendance(user_id, name, roll_number, recorded_at)
+                emit_key = f"emit:{room}:{user_id}"
+                if state.claim(emit_key, RECOGNITION_EMIT_SECONDS):
+                    with stage_seconds.time("history"):
+                        user_data = get_user_summary(user_id, attendance_buffer.pending_for(user_id))
+                    if not user_data or 'error' in user_data:
+                        logger.warning(f"Failed to get history for user {user_id}")
+                        state.release(emit_key)
+                        continue
+                    data = {
+                        'name': name,
+                        'roll_number': roll_number,
+                        'user_id': str(user_id),
+                        'history': user_data.get('history', []),
+                        'attendance_percentage': user_data.get('attendance_percentage', 0),
+                        'attended_dates': user_data.get('attended_dates', []),
+                        'department': user_data.get('department', ''),
+                        'role': user_data.get('role', '')
+                    }
+                    with stage_seconds.time("emit"):
+                        socketio.emit('user_recognized', data, to=room)
 
         if face_recognized:
             socketio.emit('recognition_status', {
                 'status': 'face-recognized',
                 'message': f'Face recognized - Welcome {name}'
-            })
+            }, to=room)
         else:
             socketio.emit('recognition_status', {
                 'status': 'face-detected',
                 'message': 'Face detected but not recognized - Please register first'
-            })
-
-        for user_id in list(current_users.keys()):
-            if user_id not in detected_users and (datetime.now() - current_users[user_id]).total_seconds() > 30:
-                del current_users[user_id]
-
-        del rgb_frame, face_locations
-        gc.collect()
+            }, to=room)
     except Exception as e:
+        frames_total.labels("failed").inc()
         logger.error(f"Error processing frame: {e}")
+    finally:
+        frame_seconds.observe(time.perf_counter() - frame_started)
+
+def run_camera_session(session):
+    """Drain a camera's pending frames, one frame at a time."""
+    try:
+        while session.pending_frames:
+            frame_data = session.pending_frames.popleft()
+            with frame_slots:
+                process_frame(session, frame_data)
+    finally:
+        session.busy = False
+
+@socketio.on('join_camera')
+def handle_join_camera(data):
+    data = data or {}
+    scope = {field: data.get(field) for field in ('department', 'role') if data.get(field)}
+    session = join_session(request.sid, data.get('camera_id'), scope or None, data.get('profile'))
+    join_room(session.camera_id)
+
+@socketio.on('subscribe_history')
+def handle_subscribe_history(*args):
+    join_room(HISTORY_ROOM)
+
+@socketio.on('unsubscribe_history')
+def handle_unsubscribe_history(*args):
+    leave_room(HISTORY_ROOM)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    leave_session(request.sid)
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
-    # Process frame asynchronously to avoid blocking
-    socketio.start_background_task(process_frame, data)
+    """Legacy frame event carrying a base64 JPEG data URL."""
+    queue_frame(session_for_sid(request.sid), data)
+
+@socketio.on('video_frame_bin')
+def handle_video_frame_bin(data):
+    """Frame event carrying raw JPEG bytes (Blob/ArrayBuffer)."""
+    if not isinstance(data, (bytes, bytearray)):
+        frames_total.labels("received").inc()
+        frames_total.labels("dropped").inc()
+        return
+    queue_frame(session_for_sid(request.sid), bytes(data))
+
+def queue_frame(session, data):
+    frames_total.labels("received").inc()
+    # Bounded per camera: the oldest frame is dropped when it is full
+    if len(session.pending_frames) == session.pending_frames.maxlen:
+        frames_total.labels("dropped").inc()
+    session.pending_frames.append(data)
+    if not session.busy:
+        session.busy = True
+        # Process frame asynchronously to avoid blocking
+        socketio.start_background_task(run_camera_session, session)
 
 @app.route('/')
 def index():
@@ -200,39 +372,71 @@ def register():
             return jsonify({"success": False, "message": "Invalid role selected"})
 
         img_data = base64.b64decode(frame_data.split(',')[1])
-        nparray = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparray, cv2.IMREAD_COLOR)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-        if not face_locations:
-            return jsonify({"success": False, "message": "No face detected in frame"})
-        top, right, bottom, left = face_locations[0]
-        h, w = frame.shape[:2]  # bounds check
-        top, bottom = max(0, top), min(h, bottom)
-        left, right = max(0, left), min(w, right)
-        if top >= bottom or left >= right:
-            return jsonify({"success": False, "message": "Invalid face crop"})
-
-        captured_frame = frame[top:bottom, left:right]
-        success, message = register_user(name, roll_number, department, role, captured_frame)
+        # Detection and encoding never run on the event loop: on a recognition
+        # worker, or a native thread when there are none
+        pool = get_recognition_pool()
+        if pool is None:
+            encoding, message = tpool.execute(encode_registration, img_data)
+        else:
+            encoding, message = pool.run(encode_registration, img_data)
+        if encoding is None:
+            return jsonify({"success": False, "message": message})
+
+        success, message, user = register_user(name, roll_number, department, role, encoding)
+        if success and face_encoding_cache is not None:
+            add_user_to_gallery(face_encoding_cache, user)
         return jsonify({"success": success, "message": message})
     except Exception as e:
         logger.error(f"Crash in /register endpoint: {e}")
         return jsonify({"success": False, "message": f"Registration crashed: {e}"})
 
+@app.route('/bulk_register', methods=['POST'])
+def bulk_register():
+    """Enroll everyone in an uploaded zip of images with a manifest.csv."""
+    archive = request.files.get('archive')
+    if archive is None:
+        return jsonify({"success": False, "message": "A zip archive is required"})
+    temporary_pool = None
+    try:
+        # Encoding never runs on the event loop: without recognition workers a
+        # temporary pool is started for this request
+        pool = get_recognition_pool()
+        if pool is None:
+            pool = temporary_pool = RecognitionPool(BULK_ENROLL_WORKERS)
+        # Encode several people at once, each on a worker
+        green_pool = eventlet.GreenPool(pool.size)
+
+        def encode_map(func, items):
+            def run(item):
+                try:
+                    return pool.run(func, item)
+                except Exception as e:
+                    return e
+            return list(green_pool.imap(run, items))
+
+        registered, failures = enroll(open_source(archive.stream), encode_map)
+        if face_encoding_cache is not None:
+            for user in registered:
+                add_user_to_gallery(face_encoding_cache, user)
+        return jsonify({"success": True, "registered": len(registered), "failed": failures})
+    except Exception as e:
+        logger.error(f"Crash in /bulk_register endpoint: {e}")
+        return jsonify({"success": False, "message": f"Bulk registration failed: {e}"})
+    finally:
+        if temporary_pool is not None:
+            temporary_pool.close()
+
 @app.route('/start_attendance', methods=['POST'])
 def start_attendance():
-    global running, last_recognized, current_users
-    running = True
-    last_recognized.clear()
-    current_users.clear()
+    state.set_flag("running", True)
+    state.clear_claims("emit:")
+    state.clear_presence()
     return jsonify({"message": "Attendance system started"})
 
 @app.route('/stop_attendance', methods=['POST'])
 def stop_attendance():
-    global running, current_users
-    running = False
-    current_users.clear()
+    state.set_flag("running", False)
+    state.clear_presence()
     return jsonify({"message": "Attendance system stopped"})
 
 @app.route('/users')
@@ -242,26 +446,14 @@ def get_users():
 
 @app.route('/history')
 def get_history():
+    """Latest attendance from the in-memory feed; honours If-None-Match."""
     try:
-        attendance = db.attendance.aggregate([
-            {"$sort": {"timestamp": -1}},
-            {"$limit": 100},
-            {"$lookup": {
-                "from": "users",
-                "localField": "user_id",
-                "foreignField": "_id",
-                "as": "user"
-            }},
-            {"$unwind": "$user"},
-            {"$project": {
-                "_id": 0,
-                "name": "$user.name",
-                "roll_number": "$user.roll_number",
-                "time": {"$dateToString": {"format": "%H:%M:%S", "date": "$timestamp"}},
-                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
-            }}
-        ])
-        return jsonify(list(attendance))
+        body, etag = get_history_feed().body()
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Browsers revalidate every time and get a 304 while nothing changed
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"/history route error: {e}")
         return jsonify({"error": "Failed to fetch history"}), 500
@@ -271,41 +463,44 @@ def get_user_history_endpoint():
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({'error': 'User ID is required'}), 400
+    if not ObjectId.is_valid(user_id):
+        return jsonify({'error': 'Invalid user ID'}), 400
+    before = request.args.get('before')
     try:
-        user_data = get_user_history(user_id)
-        if 'error' in user_data:
-            return jsonify(user_data), 404
-        return jsonify(user_data)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        limit = min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), MAX_HISTORY_PAGE_SIZE)
+        parse_history_cursor(before)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number and before a next_cursor value'}), 400
+    user_data = get_user_history(user_id, limit=max(limit, 1), before=before)
+    if 'error' in user_data:
+        return jsonify(user_data), 404 if user_data['error'] == 'User not found' else 500
+    return jsonify(user_data)
 
 @app.route('/export')
 def export_attendance():
-    attendance = list(db.attendance.find())
-    user_map = {str(u['_id']): u for u in db.users.find()}
-    export_rows = []
-    for a in attendance:
-        u = user_map.get(str(a['user_id']))
-        if u:
-            if isinstance(a['timestamp'], str):
-                a['timestamp'] = datetime.fromisoformat(a['timestamp'])
-            export_rows.append({
-                "user_id": str(a['user_id']),
-                "user_name": u['name'],
-                "roll_number": u['roll_number'],
-                "timestamp": a['timestamp'],
-                "date": a['timestamp'].date(),
-                "time": a['timestamp'].time()
-            })
-    df = pd.DataFrame(export_rows)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    return send_file(
-        io.BytesIO(csv_buffer.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f"attendance_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    """Stream attendance as CSV (default) or Parquet.
+
+    Optional filters: ``start``/``end`` dates (YYYY-MM-DD, inclusive) and
+    ``department``; ``format=parquet`` needs pyarrow installed.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    try:
+        filters = parse_export_filters(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if export_format == 'parquet':
+        if not parquet_available():
+            return jsonify({"error": "Parquet export requires pyarrow"}), 400
+        body, mimetype, extension = stream_parquet(export_rows(**filters)), 'application/vnd.apache.parquet', 'parquet'
+    elif export_format == 'csv':
+        body, mimetype, extension = stream_csv(export_rows(**filters)), 'text/csv', 'csv'
+    else:
+        return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=attendance_export_{stamp}.{extension}"}
     )
 
 @app.route('/register_user')
@@ -321,7 +516,14 @@ def manage_users_data():
 def delete_user(user_id):
     try:
         db.attendance.delete_many({"user_id": ObjectId(user_id)})
+        db.attendance_monthly.delete_many({"user_id": ObjectId(user_id)})
         db.users.delete_one({"_id": ObjectId(user_id)})
+        forget_user(user_id)
+        history_feed.remove_user(user_id)
+        # Lets other workers drop the user on their next gallery refresh
+        db.user_deletions.insert_one({"user_id": ObjectId(user_id), "deleted_at": datetime.now()})
+        if face_encoding_cache is not None:
+            face_encoding_cache.remove(user_id)
         return jsonify({"success": True, "message": f"User ID {user_id} deleted"})
     except Exception as e:
         return jsonify({"success": False, "message": f"Error deleting user: {e}"})
@@ -333,8 +535,9 @@ def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "cache_size": len(face_encoding_cache) if face_encoding_cache else 0,
-        "active_users": len(current_users),
-        "running": running
+        "active_users": state.present_count(PRESENCE_SECONDS),
+        "cameras": len(sessions),
+        "running": state.get_flag("running")
     })
 
 @app.route('/performance')
@@ -348,14 +551,28 @@ def performance_stats():
         return jsonify({
             "memory_mb": process.memory_info().rss / 1024 / 1024,
             "cpu_percent": process.cpu_percent(),
-            "active_connections": len(current_users),
+            "active_connections": state.present_count(PRESENCE_SECONDS),
             "cache_age": time.time() - face_encoding_cache_timestamp if face_encoding_cache_timestamp else 0,
             "frame_skip_ms": FRAME_SKIP_MS,
-            "running": running
+            "running": state.get_flag("running")
         })
     except ImportError:
         return jsonify({"error": "psutil not available"})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Counters and latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/diagnostics/query_plans')
+def query_plans():
+    """Explain-plan stages of the hot queries; ``ok`` is false if any scans a collection"""
+    report = explain_hot_queries()
+    return jsonify({
+        "ok": not any(plan.get("collscan") or "error" in plan for plan in report.values()),
+        "queries": report
+    })
+
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
     func = request.environ.get('werkzeug.server.shutdown')
@@ -372,6 +589,8 @@ if __name__ == '__main__':
         
         logger.info(f"Starting FaceTrace on port {port}")
         logger.info(f"Debug mode: {debug_mode}")
+        socketio.start_background_task(ensure_indexes)
+        socketio.start_background_task(warm_up_recognition)
         
         socketio.run(
             app, 
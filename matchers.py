@@ -0,0 +1,163 @@
+import os
+import numpy as np
+
+# Recognition backend: "brute" (exact linear scan) or "ivf" (inverted-file
+# index over k-means partitions, approximate).
+MATCHER_BACKEND = os.getenv("MATCHER_BACKEND", "brute").lower()
+# Galleries smaller than this always use the exact scan
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", 2000))
+# Number of partitions; 0 picks ~4*sqrt(N)
+IVF_LISTS = int(os.getenv("IVF_LISTS", 0))
+# Partitions scanned per query - higher means better recall, more latency
+IVF_PROBES = int(os.getenv("IVF_PROBES", 8))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 32
+
+
+def squared_norms(vectors):
+    return np.einsum('ij,ij->i', vectors, vectors)
+
+
+def euclidean_distances(queries, vectors, vector_sq_norms=None):
+    """M x N euclidean distance matrix computed with one matrix product."""
+    if vector_sq_norms is None:
+        vector_sq_norms = squared_norms(vectors)
+    sq = squared_norms(queries)[:, None] + vector_sq_norms[None, :] - 2.0 * (queries @ vectors.T)
+    np.maximum(sq, 0, out=sq)
+    return np.sqrt(sq, out=sq)
+
+
+def _best_per_row(dists, rows):
+    """Closest candidate per query as (global rows, distances)."""
+    if dists.shape[1] == 0:
+        count = dists.shape[0]
+        return np.full(count, -1, dtype=np.intp), np.full(count, np.inf, dtype=np.float32)
+    best = np.argmin(dists, axis=1)
+    return rows[best], dists[np.arange(len(best)), best]
+
+
+class BruteForceMatcher:
+    """Exact nearest neighbour by scanning every row of the gallery."""
+
+    name = "brute"
+
+    def __init__(self, gallery, rows=None):
+        self.gallery = gallery
+        self.rows = None if rows is None else np.asarray(rows, dtype=np.intp)
+
+    def add(self, rows):
+        # The unscoped matcher always scans every gallery row
+        if self.rows is not None:
+            self.rows = np.concatenate([self.rows, np.atleast_1d(rows).astype(np.intp)])
+
+    def search(self, queries):
+        gallery = self.gallery
+        if self.rows is None:
+            rows = np.arange(gallery.row_count, dtype=np.intp)
+            dists = euclidean_distances(queries, gallery.encodings, gallery.sq_norms)
+        else:
+            rows = self.rows
+            dists = euclidean_distances(queries, gallery.encodings[rows], gallery.sq_norms[rows])
+        if gallery.removed_count:
+            dists[:, ~gallery.active[rows]] = np.inf
+        return _best_per_row(dists, rows)
+
+
+def _kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmin(euclidean_distances(vectors, centroids), axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        order = np.argsort(assignment, kind='stable')
+        starts = np.searchsorted(assignment[order], np.arange(k))
+        filled = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        # Re-seed empty partitions from random points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+    return centroids
+
+
+class IVFMatcher:
+    """Approximate nearest neighbour over k-means partitions (inverted file).
+
+    Each query scans only the ``n_probe`` partitions whose centroids are
+    closest, so cost is roughly ``n_probe / n_lists`` of a full scan.
+    """
+
+    name = "ivf"
+
+    def __init__(self, gallery, rows=None, n_lists=IVF_LISTS, n_probe=IVF_PROBES):
+        self.gallery = gallery
+        if rows is None:
+            rows = np.flatnonzero(gallery.active)
+        rows = np.asarray(rows, dtype=np.intp)
+        vectors = gallery.encodings[rows]
+        if n_lists <= 0:
+            n_lists = int(4 * np.sqrt(len(rows)))
+        n_lists = max(1, min(n_lists, len(rows)))
+        self.n_probe = max(1, min(n_probe, n_lists))
+
+        rng = np.random.default_rng(0)
+        sample_size = min(len(rows), n_lists * KMEANS_SAMPLE_PER_LIST)
+        sample = vectors[rng.choice(len(rows), size=sample_size, replace=False)]
+        self.centroids = _kmeans(sample, n_lists)
+        self._centroid_sq_norms = squared_norms(self.centroids)
+
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.list_rows = []
+        self.list_vectors = []
+        for i in range(n_lists):
+            members = order[bounds[i]:bounds[i + 1]]
+            self.list_rows.append(rows[members])
+            self.list_vectors.append(np.ascontiguousarray(vectors[members]))
+
+    def _assign(self, vectors):
+        return np.argmin(euclidean_distances(vectors, self.centroids, self._centroid_sq_norms), axis=1)
+
+    def add(self, rows):
+        """Route new gallery rows into their nearest partition (no retraining)."""
+        rows = np.atleast_1d(rows).astype(np.intp)
+        vectors = self.gallery.encodings[rows]
+        for row, vector, list_id in zip(rows, vectors, self._assign(vectors)):
+            self.list_rows[list_id] = np.append(self.list_rows[list_id], row)
+            self.list_vectors[list_id] = np.vstack([self.list_vectors[list_id], vector])
+
+    def search(self, queries):
+        centroid_dists = euclidean_distances(queries, self.centroids, self._centroid_sq_norms)
+        if self.n_probe < len(self.centroids):
+            probes = np.argpartition(centroid_dists, self.n_probe - 1, axis=1)[:, :self.n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(len(self.centroids)), centroid_dists.shape)
+
+        best_rows = np.full(len(queries), -1, dtype=np.intp)
+        best_dists = np.full(len(queries), np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            lists = probes[i]
+            rows = np.concatenate([self.list_rows[j] for j in lists])
+            if len(rows) == 0:
+                continue
+            vectors = np.concatenate([self.list_vectors[j] for j in lists])
+            if self.gallery.removed_count:
+                keep = self.gallery.active[rows]
+                rows, vectors = rows[keep], vectors[keep]
+            dists = euclidean_distances(query[None, :], vectors)
+            row, dist = _best_per_row(dists, rows)
+            best_rows[i], best_dists[i] = row[0], dist[0]
+        return best_rows, best_dists
+
+
+def build_matcher(gallery, rows=None, backend=None):
+    """Create the configured matcher over ``rows`` (default: whole gallery)."""
+    backend = (backend or MATCHER_BACKEND).lower()
+    size = len(gallery) if rows is None else len(rows)
+    if backend == "ivf" and size >= IVF_MIN_SIZE:
+        return IVFMatcher(gallery, rows)
+    if backend not in ("brute", "ivf"):
+        raise ValueError(f"Unknown matcher backend: {backend}")
+    return BruteForceMatcher(gallery, rows)
@@ -0,0 +1,172 @@
+"""In-process counters and histograms rendered in the Prometheus text format.
+
+Kept deliberately small: metrics are created once at import time and an
+observation is a bisect plus two additions, so instrumenting the frame
+path costs next to nothing. Values are per process.
+"""
+import time
+from bisect import bisect_left
+
+# Seconds; covers a 1 ms imdecode up to a multi-second HOG pass on a slow box
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Garbage collection pauses are mostly well under a millisecond
+PAUSE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+REGISTRY = []
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf; made cumulative when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        # Optional single label name, e.g. "stage"
+        self.label = label
+        self._children = {}
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, value):
+        child = self._children.get(value)
+        if child is None:
+            child = self._children[value] = self._new_child()
+        return child
+
+    def _series(self):
+        if self.label is None:
+            yield "", self.labels(None)
+            return
+        for value, child in sorted(self._children.items()):
+            yield f'{self.label}="{value}"', child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self._series():
+            lines.extend(self._render_child(labels, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self.labels(None).inc(amount)
+
+    def _render_child(self, labels, child):
+        return [f"{self.name}{{{labels}}} {child.value}" if labels else f"{self.name} {child.value}"]
+
+
+class Gauge(_Metric):
+    """Gauge read from ``func`` at render time, or set explicitly."""
+    kind = "gauge"
+
+    def __init__(self, name, help, func=None):
+        super().__init__(name, help)
+        self.func = func
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def _series(self):
+        yield "", None
+
+    def _render_child(self, labels, child):
+        value = self.func() if self.func is not None else self.value
+        return [f"{self.name} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, label=None, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, label)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels(None).observe(value)
+
+    def time(self, value=None):
+        """Context manager observing the duration of its block."""
+        return _Timer(self.labels(value))
+
+    def _render_child(self, labels, child):
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{self.name}_sum{suffix} {child.sum}")
+        lines.append(f"{self.name}_count{suffix} {child.count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Recognition pipeline. Worker-side stages (base64, imdecode, resize,
+# detect, encode) are timed in analyze_frame and reported back with its
+# result; the rest are timed in process_frame.
+stage_seconds = Histogram("facetrace_stage_seconds", "Time spent per recognition stage.", label="stage")
+frame_seconds = Histogram("facetrace_frame_seconds", "End-to-end process_frame time.")
+frames_total = Counter("facetrace_frames_total", "Frames by outcome.", label="outcome")
+db_seconds = Histogram("facetrace_db_seconds", "MongoDB call latency.", label="op")
+gallery_load_seconds = Gauge("facetrace_gallery_load_seconds", "Duration of the last full gallery load.")
+gc_seconds = Histogram("facetrace_gc_seconds", "Garbage collection pauses by generation.", label="generation",
+                       buckets=PAUSE_BUCKETS)
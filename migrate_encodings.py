@@ -0,0 +1,82 @@
+"""Convert stored face encodings to the packed binary format.
+
+Rewrites users whose encoding is still a 128-element float list (or is
+packed in a different format) into ``face_encoding_bin`` and drops the
+legacy list field. Users enrolled before the incremental gallery refresh
+get an ``updated_at`` (their creation time), so the refresh can see them.
+Safe to re-run.
+
+    python migrate_encodings.py [--format float32|float16|int8] [--dry-run]
+"""
+import argparse
+import logging
+
+from pymongo import UpdateOne
+
+from config import db
+from encoding_codec import ENCODING_FORMAT, ENCODING_FORMATS, pack_encoding, unpack_encoding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def migrate(fmt=ENCODING_FORMAT, dry_run=False):
+    pending = {"$or": [
+        {"face_encoding_bin": {"$exists": False}},
+        {"encoding_format": {"$ne": fmt}},
+    ]}
+    projection = {"face_encoding": 1, "face_encoding_bin": 1, "encoding_format": 1, "encoding_scale": 1}
+    migrated, failed = 0, 0
+    batch = []
+    for user in db.users.find(pending, projection):
+        try:
+            fields = pack_encoding(unpack_encoding(user), fmt)
+        except Exception as e:
+            logger.error(f"Skipping user {user['_id']}: {e}")
+            failed += 1
+            continue
+        unset = {"face_encoding": ""}
+        if "encoding_scale" not in fields:
+            unset["encoding_scale"] = ""
+        batch.append(UpdateOne({"_id": user["_id"]}, {"$set": fields, "$unset": unset}))
+        if len(batch) >= BATCH_SIZE:
+            migrated += _flush(batch, dry_run)
+            batch = []
+    if batch:
+        migrated += _flush(batch, dry_run)
+    return migrated, failed
+
+
+def backfill_updated_at(dry_run=False):
+    """Set ``updated_at`` to the creation time where it is missing."""
+    backfilled = 0
+    batch = []
+    for user in db.users.find({"updated_at": {"$exists": False}}, {"_id": 1}):
+        # Naive local time, like every other updated_at
+        created_at = user["_id"].generation_time.astimezone().replace(tzinfo=None)
+        batch.append(UpdateOne({"_id": user["_id"]}, {"$set": {"updated_at": created_at}}))
+        if len(batch) >= BATCH_SIZE:
+            backfilled += _flush(batch, dry_run)
+            batch = []
+    if batch:
+        backfilled += _flush(batch, dry_run)
+    return backfilled
+
+
+def _flush(batch, dry_run):
+    if not dry_run:
+        db.users.bulk_write(batch, ordered=False)
+    return len(batch)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert stored face encodings to packed binary.")
+    parser.add_argument("--format", choices=ENCODING_FORMATS, default=ENCODING_FORMAT)
+    parser.add_argument("--dry-run", action="store_true", help="count users without writing")
+    args = parser.parse_args()
+    migrated, failed = migrate(args.format, args.dry_run)
+    logger.info(f"{'Would migrate' if args.dry_run else 'Migrated'} {migrated} users, {failed} failed.")
+    backfilled = backfill_updated_at(args.dry_run)
+    logger.info(f"{'Would backfill' if args.dry_run else 'Backfilled'} updated_at on {backfilled} users.")
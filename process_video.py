@@ -0,0 +1,206 @@
+"""Attendance from a recorded video file.
+
+The video is split into segments that worker processes decode, sample
+and analyse independently (each opens the file itself, so frames never
+cross process boundaries). Faces are matched against the same gallery as
+the live path and attendance is written through an AttendanceBuffer, so
+records are stamped with the time they were captured and deduplicated
+per user and minute like live recognition:
+
+    python process_video.py lecture.mp4 --start 2024-03-04T09:00 [--fps 1] [--workers 8]
+
+Without ``--start`` the recording is assumed to have ended at the file's
+modification time.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from detectors import ScalePolicy, detect_faces, encode_faces, warm_up
+from face_gallery import ENCODING_DIM
+from face_tracker import frame_thumbnail, frame_changed, MAX_GATED_SECONDS
+from frame_memory import configure_gc
+from frame_pipeline import limit_width
+
+logger = logging.getLogger(__name__)
+
+# Frames analysed per second of video
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", 1))
+# Seconds of video per worker task; shorter segments balance better,
+# longer ones seek less
+VIDEO_SEGMENT_SECONDS = 60
+# Recorded lectures are usually wide shots of a room
+VIDEO_PROFILE = "classroom"
+
+
+def video_info(path):
+    """(fps, frame count, duration in seconds) of a video file."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    return fps, frames, frames / fps if frames > 0 else 0.0
+
+
+def plan_segments(frames, fps, segment_seconds=VIDEO_SEGMENT_SECONDS):
+    """(first, end) frame ranges; one open-ended segment if the length is unknown."""
+    if frames <= 0:
+        return [(0, None)]
+    length = max(1, int(segment_seconds * fps))
+    return [(first, min(first + length, frames)) for first in range(0, frames, length)]
+
+
+def _init_worker():
+    # One process per core already; OpenCV's own threads would oversubscribe
+    cv2.setNumThreads(1)
+    configure_gc()
+    warm_up()
+
+
+def analyze_segment(path, first, end, step, profile=VIDEO_PROFILE):
+    """Detect and encode faces on every ``step``-th frame in [first, end).
+
+    Frames that barely differ from the last analysed one reuse its
+    encodings, as in the live path. Returns a dict with ``samples``, a
+    list of (frame index, float32 encodings), and counters.
+    """
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    if first:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+    scale = ScalePolicy(profile)
+    samples, analyzed = [], 0
+    reference, reference_index = None, first
+    encodings = np.empty((0, ENCODING_DIM), dtype=np.float32)
+    decoded = None
+    index = first
+    try:
+        while end is None or index < end:
+            sampled = (index - first) % step == 0
+            # grab() skips the colour conversion for frames that are not sampled
+            if not capture.grab():
+                break
+            if sampled:
+                # Decoded into the previous frame's array when the size matches
+                ok, decoded = capture.retrieve(decoded)
+                if not ok:
+                    break
+                frame = limit_width(decoded, reuse=True)
+                thumbnail = frame_thumbnail(frame)
+                stale = (index - reference_index) / fps >= MAX_GATED_SECONDS
+                if stale or frame_changed(reference, thumbnail):
+                    boxes, heights = detect_faces(frame, *scale.params())
+                    scale.update(heights)
+                    encodings = np.asarray(encode_faces(frame, boxes) if boxes else [],
+                                           dtype=np.float32).reshape(-1, ENCODING_DIM)
+                    reference, reference_index = thumbnail, index
+                    analyzed += 1
+                samples.append((index, encodings))
+            index += 1
+    finally:
+        capture.release()
+    return {"samples": samples, "analyzed": analyzed, "frames": index - first}
+
+
+def process_video(path, gallery, start_time, buffer=None, sample_fps=VIDEO_SAMPLE_FPS,
+                  workers=None, profile=VIDEO_PROFILE, scope=None, tolerance=0.5):
+    """Recognise the people in a recorded video and queue their attendance.
+
+    ``buffer`` is an AttendanceBuffer (None for a dry run); the caller
+    flushes it. Returns a report with frame counts, throughput, the
+    attendance records queued and the number of sampled frames each
+    recognised user was seen in.
+    """
+    fps, frames, duration = video_info(path)
+    step = max(1, round(fps / sample_fps))
+    segments = plan_segments(frames, fps)
+    started = time.perf_counter()
+    seen = Counter()
+    names = {}
+    sampled = analyzed = decoded = faces = queued = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(analyze_segment, path, first, end, step, profile) for first, end in segments]
+        # In video order, so the earliest capture in each minute is the one recorded
+        for done, future in enumerate(futures, 1):
+            result = future.result()
+            sampled += len(result["samples"])
+            analyzed += result["analyzed"]
+            decoded += result["frames"]
+            for index, encodings in result["samples"]:
+                faces += len(encodings)
+                best_indices, _ = gallery.match(encodings, tolerance=tolerance, scope=scope)
+                captured_at = start_time + timedelta(seconds=index / fps)
+                for i in set(best_indices.tolist()) - {-1}:
+                    user_id = gallery.ids[i]
+                    seen[user_id] += 1
+                    names[user_id] = (gallery.names[i], gallery.roll_numbers[i])
+                    if buffer is not None and buffer.add(user_id, captured_at):
+                        queued += 1
+            logger.info(f"Segment {done}/{len(segments)} done, {len(seen)} people recognised so far")
+
+    elapsed = time.perf_counter() - started
+    duration = duration or decoded / fps
+    return {
+        "video": path,
+        "start": start_time.isoformat(),
+        "duration_seconds": round(duration, 1),
+        "frames_decoded": decoded,
+        "frames_sampled": sampled,
+        "frames_analyzed": analyzed,
+        "faces": faces,
+        "elapsed_seconds": round(elapsed, 1),
+        "realtime_factor": round(duration / elapsed, 1) if elapsed else None,
+        "attendance_records": queued,
+        "recognized": [
+            {"user_id": user_id, "name": names[user_id][0], "roll_number": names[user_id][1], "samples": count}
+            for user_id, count in seen.most_common()
+        ],
+    }
+
+
+if __name__ == '__main__':
+    from attendance_utils import AttendanceBuffer, load_gallery
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Record attendance from a video file.")
+    parser.add_argument("video")
+    parser.add_argument("--start", type=datetime.fromisoformat,
+                        help="capture time of the first frame (default: file mtime minus duration)")
+    parser.add_argument("--fps", type=float, default=VIDEO_SAMPLE_FPS, help="frames analysed per second of video")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--profile", default=VIDEO_PROFILE)
+    parser.add_argument("--department")
+    parser.add_argument("--role")
+    parser.add_argument("--dry-run", action="store_true", help="report who was recognised without writing")
+    args = parser.parse_args()
+
+    start_time = args.start
+    if start_time is None:
+        _, _, duration = video_info(args.video)
+        start_time = datetime.fromtimestamp(os.path.getmtime(args.video)) - timedelta(seconds=duration)
+    scope = {field: value for field, value in (("department", args.department), ("role", args.role)) if value}
+
+    gallery, encoding_errors = load_gallery()
+    if len(gallery) == 0:
+        raise SystemExit("No users in the gallery")
+    buffer = None if args.dry_run else AttendanceBuffer()
+    report = process_video(args.video, gallery, start_time, buffer, sample_fps=args.fps,
+                           workers=args.workers, profile=args.profile, scope=scope or None)
+    if buffer is not None:
+        buffer.flush()
+        if len(buffer):
+            logger.error(f"{len(buffer)} attendance records could not be written")
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,143 @@
+import logging
+import multiprocessing
+import os
+
+from eventlet import Timeout
+from eventlet.green.select import select
+from eventlet.queue import LightQueue
+
+from detectors import warm_up
+from frame_memory import configure_gc, freeze_startup_objects
+from frame_pipeline import analyze_frame
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for detection/encoding; 0 runs them in the web process
+RECOGNITION_WORKERS = int(os.getenv("RECOGNITION_WORKERS", 0))
+# A job taking longer than this is abandoned and its worker replaced
+RECOGNITION_TIMEOUT_SECONDS = float(os.getenv("RECOGNITION_TIMEOUT_SECONDS", 30))
+
+
+def _worker_loop(conn):
+    """Worker process: run (function, args) jobs received over ``conn`` until it closes."""
+    # The pipe was created non-blocking by the parent's green socket module
+    os.set_blocking(conn.fileno(), True)
+    configure_gc()
+    try:
+        warm_up()
+    except ImportError as e:
+        # Jobs will report the error; exiting would only get the worker respawned
+        logger.error(f"Recognition worker could not load face_recognition: {e}")
+    # dlib, numpy and cv2 internals never become garbage
+    freeze_startup_objects()
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(("ok", func(*args)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class RecognitionPool:
+    """Fixed set of worker processes for CPU-bound face work (mostly ``analyze_frame``).
+
+    dlib detection/encoding holds the CPU for hundreds of milliseconds, so it
+    runs outside the eventlet loop. A caller waits (cooperatively) for an
+    idle worker, which bounds in-flight frames to the number of workers.
+    Matching stays in the web process, where the gallery lives.
+    """
+
+    def __init__(self, workers):
+        self.size = workers
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = LightQueue()
+        self._processes = {}
+        for _ in range(workers):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_loop, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        self._processes[parent_conn] = process
+        return parent_conn
+
+    def _replace_worker(self, conn):
+        process = self._processes.pop(conn, None)
+        if process is not None and process.is_alive():
+            process.terminate()
+        conn.close()
+        return self._start_worker()
+
+    def run(self, func, *args):
+        """Run a module-level function in a worker and return its result.
+
+        A worker that has exited, exits during the job or does not answer
+        within RECOGNITION_TIMEOUT_SECONDS is replaced and RuntimeError
+        raised, so a lost worker never holds its caller (or the pool) forever.
+        """
+        conn = self._idle.get()
+        process = self._processes[conn]
+        try:
+            if not process.is_alive():
+                raise EOFError(f"exited with code {process.exitcode}")
+            with Timeout(RECOGNITION_TIMEOUT_SECONDS, TimeoutError("no answer in time")):
+                conn.send((func, args))
+                # Yield to other green threads until the worker answers or exits;
+                # the hub can wake us spuriously when pipe descriptors are reused
+                while not conn.poll():
+                    if not process.is_alive():
+                        raise EOFError(f"exited with code {process.exitcode}")
+                    select([conn.fileno(), process.sentinel], [], [])
+                status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            logger.error(f"Recognition worker lost: {e}")
+            conn = self._replace_worker(conn)
+            raise RuntimeError(f"Recognition worker lost: {e}") from e
+        finally:
+            self._idle.put(conn)
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+    def close(self):
+        for conn, process in list(self._processes.items()):
+            conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+
+
+_pool = None
+
+
+def get_recognition_pool():
+    """Pool shared by all cameras, or None to analyze frames inline.
+
+    Created on first use so gunicorn's preloading master never owns the
+    worker pipes.
+    """
+    global _pool
+    if RECOGNITION_WORKERS <= 0:
+        return None
+    if _pool is None:
+        _pool = RecognitionPool(RECOGNITION_WORKERS)
+        logger.info(f"Started {RECOGNITION_WORKERS} recognition workers")
+    return _pool
+
+
+def run_in_pool(func, *args):
+    """Run ``func`` on the pool if configured, else inline."""
+    pool = get_recognition_pool()
+    if pool is None:
+        return func(*args)
+    return pool.run(func, *args)
+
+
+def analyze(*args):
+    return run_in_pool(analyze_frame, *args)
@@ -0,0 +1,144 @@
+"""Index bootstrap and query-plan diagnostics.
+
+``ensure_indexes`` is idempotent: creating an index that already exists
+with the same spec is a no-op, so it runs on every start (gunicorn's
+post_worker_init, ``python main.py``) or by hand with ``python schema.py``.
+``explain_hot_queries`` reports the winning plan of the queries on the
+recognition/history paths so a regression to a collection scan shows up
+on ``/diagnostics/query_plans``.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from config import db
+
+logger = logging.getLogger(__name__)
+
+# Deletion markers only need to outlive the gallery refresh interval
+USER_DELETIONS_TTL_SECONDS = int(os.getenv("USER_DELETIONS_TTL_SECONDS", 7 * 24 * 3600))
+
+# name -> (collection, keys, options)
+INDEXES = {
+    # get_user_history, the summary backfill aggregation and delete_user
+    "user_timestamp": ("attendance", [("user_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    # /history and date-filtered /export
+    "timestamp": ("attendance", [("timestamp", DESCENDING)], {}),
+    # Durable per-minute dedup of buffered attendance writes; partial so
+    # records written before buckets existed do not collide
+    "attendance_dedup": ("attendance", [("user_id", ASCENDING), ("bucket", ASCENDING)], {
+        "unique": True, "partialFilterExpression": {"bucket": {"$exists": True}}}),
+    "roll_number_unique": ("users", [("roll_number", ASCENDING)], {"unique": True}),
+    # Incremental gallery refresh
+    "updated_at": ("users", [("updated_at", ASCENDING)], {}),
+    "user_month": ("attendance_monthly", [("user_id", ASCENDING), ("month", ASCENDING)], {"unique": True}),
+    "deleted_at_ttl": ("user_deletions", [("deleted_at", ASCENDING)], {
+        "expireAfterSeconds": USER_DELETIONS_TTL_SECONDS}),
+}
+
+
+def ensure_index(collection, name):
+    """Create one index from INDEXES on ``collection``."""
+    _, keys, options = INDEXES[name]
+    collection.create_index(keys, name=name, **options)
+
+
+def ensure_indexes(database=None):
+    """Create every index in INDEXES. Returns the names that failed.
+
+    Failures (e.g. duplicate roll numbers blocking the unique index, an
+    index of the same name with other options, or MongoDB being
+    unreachable) are logged, not raised, so the app still starts. When the
+    server cannot be reached the remaining indexes are not attempted.
+    """
+    database = db if database is None else database
+    failed = []
+    names = list(INDEXES)
+    for position, name in enumerate(names):
+        collection = INDEXES[name][0]
+        try:
+            ensure_index(database[collection], name)
+        except ConnectionFailure as e:
+            logger.error(f"Could not reach MongoDB to create indexes: {e}")
+            failed.extend(names[position:])
+            break
+        except PyMongoError as e:
+            logger.error(f"Could not create index {collection}.{name}: {e}")
+            failed.append(name)
+    if not failed:
+        logger.info(f"Indexes ready ({len(INDEXES)}).")
+    return failed
+
+
+def _plan_stages(plan):
+    """Stage names of a winning plan, outermost first."""
+    stages = [plan.get("stage")]
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+def _index_names(plan):
+    names = [plan["indexName"]] if plan.get("indexName") else []
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            names.extend(_index_names(child))
+    return names
+
+
+def hot_queries():
+    """(name, collection, filter, sort) for the queries that must use an index."""
+    user_id = ObjectId()
+    now = datetime.now()
+    return [
+        ("user_history", "attendance", {"user_id": user_id}, [("timestamp", DESCENDING)]),
+        ("user_month", "attendance", {"user_id": user_id, "timestamp": {"$gte": now - timedelta(days=31), "$lt": now}},
+         None),
+        ("recent_history", "attendance", {}, [("timestamp", DESCENDING)]),
+        ("export_range", "attendance", {"timestamp": {"$gte": now - timedelta(days=1), "$lt": now}},
+         [("timestamp", ASCENDING)]),
+        ("delete_user", "attendance", {"user_id": user_id}, None),
+        ("gallery_refresh", "users", {"updated_at": {"$gt": now}}, None),
+        ("roll_number", "users", {"roll_number": {"$in": ["0"]}}, None),
+        ("monthly_summary", "attendance_monthly", {"user_id": user_id, "month": now.strftime('%Y-%m')}, None),
+        ("deletions_since", "user_deletions", {"deleted_at": {"$gt": now}}, None),
+    ]
+
+
+def explain_hot_queries(database=None):
+    """Winning-plan stages and index per hot query; ``collscan`` flags a regression."""
+    database = db if database is None else database
+    report = {}
+    for name, collection, query, sort in hot_queries():
+        try:
+            cursor = database[collection].find(query).limit(100)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain()["queryPlanner"]["winningPlan"]
+            # Sharded clusters wrap the per-shard plans
+            if "shards" in plan:
+                plan = plan["shards"][0]["winningPlan"]
+            plan = plan.get("queryPlan", plan)
+            stages = _plan_stages(plan)
+            report[name] = {
+                "collection": collection,
+                "stages": stages,
+                "indexes": _index_names(plan),
+                "collscan": "COLLSCAN" in stages,
+            }
+        except Exception as e:
+            report[name] = {"collection": collection, "error": str(e)}
+    return report
+
+
+if __name__ == '__main__':
+    import json
+    logging.basicConfig(level=logging.INFO)
+    failed = ensure_indexes()
+    print(json.dumps(explain_hot_queries(), indent=2))
+    raise SystemExit(1 if failed else 0)
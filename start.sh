@@ -22,6 +22,8 @@ if command -v gunicorn &> /dev/null; then
     gunicorn -c gunicorn.conf.py main:app
 else
     echo "Gunicorn not available, starting with python..."
+    # Keep dlib off the event loop: one recognition worker per spare core
+    export RECOGNITION_WORKERS=${RECOGNITION_WORKERS:-$(( $(nproc) > 1 ? $(nproc) - 1 : 1 ))}
     echo "Python direct mode on port ${PORT:-5000}"
     python main.py
 fi
\ No newline at end of file
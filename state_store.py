@@ -0,0 +1,117 @@
+"""Recognition state shared by every web worker.
+
+The attendance on/off flag, the per-user attendance and per-camera emit
+cooldowns, and who is currently in front of a camera used to be module
+globals, which pinned the app to one gunicorn worker. They now live
+behind a small store:
+
+- ``memory`` (default): in-process, for a single worker
+- ``redis``: any Redis-compatible server at ``REDIS_URL`` (needs the
+  ``redis`` package), shared by all workers and instances
+
+Per-camera frame queues and trackers stay in the worker that owns the
+camera's socket (camera_sessions.py).
+"""
+import os
+import time
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STATE_KEY_PREFIX = "facetrace:"
+# Memory store: expired claims are swept once this many have accumulated
+_SWEEP_SIZE = 10000
+
+
+class MemoryStateStore:
+    def __init__(self):
+        self._flags = {}
+        self._claims = {}
+        self._presence = {}
+
+    def get_flag(self, name):
+        return self._flags.get(name, False)
+
+    def set_flag(self, name, value):
+        self._flags[name] = bool(value)
+
+    def claim(self, key, seconds):
+        """True if ``key`` was not claimed in the last ``seconds``; claims it."""
+        now = time.time()
+        expires = self._claims.get(key)
+        if expires is not None and expires > now:
+            return False
+        if len(self._claims) >= _SWEEP_SIZE:
+            self._claims = {k: v for k, v in self._claims.items() if v > now}
+        self._claims[key] = now + seconds
+        return True
+
+    def release(self, key):
+        self._claims.pop(key, None)
+
+    def clear_claims(self, prefix):
+        for key in [k for k in self._claims if k.startswith(prefix)]:
+            del self._claims[key]
+
+    def mark_present(self, camera_id, user_id):
+        self._presence[(camera_id, user_id)] = time.time()
+
+    def present_count(self, seconds):
+        """Distinct (camera, user) pairs seen in the last ``seconds``."""
+        cutoff = time.time() - seconds
+        self._presence = {k: seen for k, seen in self._presence.items() if seen > cutoff}
+        return len(self._presence)
+
+    def clear_presence(self):
+        self._presence.clear()
+
+
+class RedisStateStore:
+    """Same interface on Redis; every operation is a single atomic command."""
+
+    def __init__(self, client, prefix=STATE_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def get_flag(self, name):
+        return self.client.get(self.prefix + "flag:" + name) == b"1"
+
+    def set_flag(self, name, value):
+        self.client.set(self.prefix + "flag:" + name, "1" if value else "0")
+
+    def claim(self, key, seconds):
+        return bool(self.client.set(self.prefix + "claim:" + key, "1", nx=True, ex=max(1, int(seconds))))
+
+    def release(self, key):
+        self.client.delete(self.prefix + "claim:" + key)
+
+    def clear_claims(self, prefix):
+        keys = list(self.client.scan_iter(match=self.prefix + "claim:" + prefix + "*", count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+    def mark_present(self, camera_id, user_id):
+        self.client.zadd(self.prefix + "presence", {f"{camera_id}:{user_id}": time.time()})
+
+    def present_count(self, seconds):
+        key = self.prefix + "presence"
+        cutoff = time.time() - seconds
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(key, "-inf", cutoff)
+        pipe.zcard(key)
+        return pipe.execute()[1]
+
+    def clear_presence(self):
+        self.client.delete(self.prefix + "presence")
+
+
+def create_state_store(backend=None):
+    backend = backend or STATE_BACKEND
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "redis":
+        import redis
+        return RedisStateStore(redis.Redis.from_url(REDIS_URL))
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+
+
+state = create_state_store()
@@ -1,9 +1,23 @@
 document.addEventListener('DOMContentLoaded', () => {
-    const socket = io.connect(location.protocol + '//' + document.domain + ':' + location.port);
+    // Websocket only: one long-lived connection stays on one server worker,
+    // while polling requests could be routed to different gunicorn workers
+    const socket = io.connect(location.protocol + '//' + document.domain + ':' + location.port,
+                              { transports: ['websocket'] });
     console.log('SocketIO initialized, connecting to:', location.protocol + '//' + document.domain + ':' + location.port);
 
     socket.on('connect', () => {
         console.log('SocketIO connected');
+        // Optional ?camera=<id>&department=<dept>&role=<role> groups kiosks into one camera session;
+        // ?profile=classroom|kiosk picks the detection profile
+        const params = new URLSearchParams(location.search);
+        if (params.get('camera') || params.get('department') || params.get('role') || params.get('profile')) {
+            socket.emit('join_camera', {
+                camera_id: params.get('camera'),
+                department: params.get('department'),
+                role: params.get('role'),
+                profile: params.get('profile')
+            });
+        }
     });
 
     socket.on('disconnect', () => {
@@ -47,12 +61,26 @@ document.addEventListener('DOMContentLoaded', () => {
                 isFrameProcessing = true;
                 try {
                     context.drawImage(video, 0, 0, canvas.width, canvas.height);
-                    const frameData = canvas.toDataURL('image/jpeg', 0.5); // Much lower quality for speed
-                    socket.emit('video_frame', frameData);
                     lastFrameTime = timestamp;
+                    if (canvas.toBlob) {
+                        // Raw JPEG bytes avoid base64 overhead on the wire and on the server
+                        canvas.toBlob(blob => {
+                            if (!blob) {
+                                isFrameProcessing = false;
+                                return;
+                            }
+                            blob.arrayBuffer()
+                                .then(buffer => socket.emit('video_frame_bin', buffer))
+                                .catch(e => console.error('Error reading frame:', e))
+                                .finally(() => { isFrameProcessing = false; });
+                        }, 'image/jpeg', 0.5);
+                    } else {
+                        const frameData = canvas.toDataURL('image/jpeg', 0.5); // Much lower quality for speed
+                        socket.emit('video_frame', frameData);
+                        isFrameProcessing = false;
+                    }
                 } catch (e) {
                     console.error('Error capturing frame:', e);
-                } finally {
                     isFrameProcessing = false;
                 }
             }
@@ -166,6 +194,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const historyTableBody = document.querySelector('#history-table tbody');
         const usersTableBody = document.querySelector('#users-table tbody');
         const userHistoryTableBody = document.querySelector('#user-history-table tbody');
+        const userHistoryMoreBtn = document.getElementById('user-history-more-btn');
         const attendancePercentage = document.getElementById('recognized-attendance-percentage');
 
         // Add elements for department and role
@@ -182,7 +211,11 @@ document.addEventListener('DOMContentLoaded', () => {
             setTimeout(() => modal.style.display = 'none', 300);
         }
 
-        document.querySelector('#history-modal .close').addEventListener('click', () => hideModal(historyModal));
+        document.querySelector('#history-modal .close').addEventListener('click', () => {
+            hideModal(historyModal);
+            historySubscribed = false;
+            socket.emit('unsubscribe_history');
+        });
         document.querySelector('#manage-users-modal .close').addEventListener('click', () => hideModal(manageUsersModal));
         document.querySelector('#user-recognition-modal .close').addEventListener('click', () => {
             hideModal(userRecognitionModal);
@@ -228,29 +261,52 @@ document.addEventListener('DOMContentLoaded', () => {
                 .catch(error => console.error('Stop Attendance error:', error));
         }, 300));
 
+        // Rows shown in the history table; matches the server's feed size
+        const HISTORY_ROWS = 100;
+        let historySubscribed = false;
+
+        function historyRow(record) {
+            const tr = document.createElement('tr');
+            tr.innerHTML = `
+                <td>${record.name}</td>
+                <td>${record.roll_number}</td>
+                <td>${record.time}</td>
+                <td>${record.date}</td>
+            `;
+            return tr;
+        }
+
         historyBtn.addEventListener('click', debounce(() => {
-            fetch('/history')
+            // The server answers 304 from its ETag while nothing changed
+            fetch('/history', { cache: 'no-cache' })
                 .then(response => {
                     if (!response.ok) throw new Error('Network response was not ok');
                     return response.json();
                 })
                 .then(data => {
                     historyTableBody.innerHTML = '';
-                    data.forEach(record => {
-                        const tr = document.createElement('tr');
-                        tr.innerHTML = `
-                            <td>${record.name}</td>
-                            <td>${record.roll_number}</td>
-                            <td>${record.time}</td>
-                            <td>${record.date}</td>
-                        `;
-                        historyTableBody.appendChild(tr);
-                    });
+                    data.forEach(record => historyTableBody.appendChild(historyRow(record)));
+                    // New entries are pushed while the table is open
+                    historySubscribed = true;
+                    socket.emit('subscribe_history');
                     showModal(historyModal);
                 })
                 .catch(error => console.error('History error:', error));
         }, 300));
 
+        socket.on('attendance_event', (record) => {
+            if (!historySubscribed) return;
+            historyTableBody.insertBefore(historyRow(record), historyTableBody.firstChild);
+            while (historyTableBody.children.length > HISTORY_ROWS) {
+                historyTableBody.lastChild.remove();
+            }
+        });
+
+        // Rooms do not survive a reconnect
+        socket.on('connect', () => {
+            if (historySubscribed) socket.emit('subscribe_history');
+        });
+
         manageUsersBtn.addEventListener('click', debounce(() => {
             fetch('/manage_users_data')
                 .then(response => {
@@ -310,11 +366,9 @@ document.addEventListener('DOMContentLoaded', () => {
                         document.getElementById('recognized-role').textContent = userData.role || 'N/A';
                         document.getElementById('recognized-attendance-percentage').textContent = userData.attendance_percentage;
                         userHistoryTableBody.innerHTML = '';
-                        userData.history.forEach(record => {
-                            const tr = document.createElement('tr');
-                            tr.innerHTML = `<td>${record.time}</td><td>${record.date}</td>`;
-                            userHistoryTableBody.appendChild(tr);
-                        });
+                        appendUserHistory(userData.history);
+                        historyUserId = userId;
+                        setHistoryCursor(userData.next_cursor);
                         currentAttendedDates = Array.isArray(userData.attended_dates) ? userData.attended_dates : [];
                         console.log('Updated currentAttendedDates (details):', currentAttendedDates);
                         showModal(userRecognitionModal);
@@ -354,6 +408,40 @@ document.addEventListener('DOMContentLoaded', () => {
         let lastRecognizedRoll = null;
         let lastEventTimestamp = 0;
         let currentUserId = null;
+        // Records in the recognition popup; matches HISTORY_PREVIEW on the server
+        const USER_HISTORY_PREVIEW = 10;
+        // User and next_cursor of the history shown in the user modal
+        let historyUserId = null;
+        let historyCursor = null;
+
+        function appendUserHistory(records) {
+            records.forEach(record => {
+                const tr = document.createElement('tr');
+                tr.innerHTML = `<td>${record.time}</td><td>${record.date}</td>`;
+                userHistoryTableBody.appendChild(tr);
+            });
+        }
+
+        function setHistoryCursor(cursor) {
+            historyCursor = cursor || null;
+            userHistoryMoreBtn.style.display = historyCursor ? 'block' : 'none';
+        }
+
+        userHistoryMoreBtn.addEventListener('click', debounce(() => {
+            if (!historyUserId || !historyCursor) return;
+            userHistoryMoreBtn.disabled = true;
+            fetch(`/get_user_history?user_id=${historyUserId}&before=${encodeURIComponent(historyCursor)}`)
+                .then(response => {
+                    if (!response.ok) throw new Error('Network response was not ok');
+                    return response.json();
+                })
+                .then(userData => {
+                    appendUserHistory(userData.history);
+                    setHistoryCursor(userData.next_cursor);
+                })
+                .catch(error => console.error('Load more history error:', error))
+                .finally(() => { userHistoryMoreBtn.disabled = false; });
+        }, 300));
 
         function showNextRecognized() {
             if (recognizedQueue.length === 0) return;
@@ -364,13 +452,14 @@ document.addEventListener('DOMContentLoaded', () => {
             document.getElementById('recognized-role').textContent = data.role || 'N/A';
             document.getElementById('recognized-attendance-percentage').textContent = data.attendance_percentage;
             userHistoryTableBody.innerHTML = '';
-            data.history.forEach(record => {
-                const tr = document.createElement('tr');
-                tr.innerHTML = `<td>${record.time}</td><td>${record.date}</td>`;
-                userHistoryTableBody.appendChild(tr);
-            });
+            appendUserHistory(data.history);
             currentAttendedDates = Array.isArray(data.attended_dates) ? data.attended_dates : [];
             currentUserId = data.user_id || null;
+            // The popup carries a short preview; older records page from its last row
+            historyUserId = currentUserId;
+            const last = data.history[data.history.length - 1];
+            const more = currentUserId && data.history.length >= USER_HISTORY_PREVIEW;
+            setHistoryCursor(more ? `${last.date}T${last.time}` : null);
             lastRecognizedRoll = data.roll_number;
         
             tickOverlay.style.display = 'flex';
@@ -394,7 +483,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
         attendancePercentage.addEventListener('click', debounce(() => {
             if (currentUserId) {
-                fetch(`/get_user_history?user_id=${currentUserId}`)
+                // Only the summary is needed for the calendar
+                fetch(`/get_user_history?user_id=${currentUserId}&limit=1`)
                     .then(response => {
                         if (!response.ok) throw new Error('Network response was not ok');
                         return response.json();
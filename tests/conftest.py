@@ -0,0 +1,22 @@
+import os
+
+# config.py refuses to import without these; tests pass their own databases
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "facetrace_test")
+
+import mongomock
+import numpy as np
+import pytest
+
+from face_gallery import ENCODING_DIM
+
+
+def random_encodings(count, seed=0):
+    """Unit-length float32 encodings, far enough apart to match only themselves."""
+    vectors = np.random.default_rng(seed).standard_normal((count, ENCODING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def database():
+    return mongomock.MongoClient()["facetrace_test"]
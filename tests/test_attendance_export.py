@@ -0,0 +1,73 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import attendance_export
+from attendance_export import EXPORT_COLUMNS, export_rows, parse_export_filters, stream_csv, stream_parquet
+
+START = datetime(2024, 3, 4, 9, 0, 0, 500000)
+
+
+def test_parse_export_filters():
+    assert parse_export_filters(MultiDict()) == {"start": None, "end": None, "department": None}
+    filters = parse_export_filters(MultiDict({"start": "2024-03-01", "end": "2024-03-04", "department": "CSE"}))
+    # The end date is inclusive: the filter stops at the next midnight
+    assert filters == {"start": datetime(2024, 3, 1), "end": datetime(2024, 3, 5), "department": "CSE"}
+    assert parse_export_filters(MultiDict({"department": ""}))["department"] is None
+    with pytest.raises(ValueError):
+        parse_export_filters(MultiDict({"start": "03/01/2024"}))
+
+
+def rows(count):
+    return [("u1", "Ada, \"the first\"", "7", START + timedelta(minutes=i)) for i in range(count)]
+
+
+def test_stream_csv(monkeypatch):
+    monkeypatch.setattr(attendance_export, "CSV_CHUNK_ROWS", 2)
+    chunks = list(stream_csv(iter(rows(5))))
+    # Header plus two full chunks, then the rest
+    assert len(chunks) == 3
+    parsed = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert parsed[0] == EXPORT_COLUMNS
+    assert parsed[1] == ["u1", "Ada, \"the first\"", "7", "2024-03-04 09:00:00.500000", "2024-03-04", "09:00:00.500000"]
+    assert len(parsed) == 6
+
+
+def test_stream_csv_without_rows():
+    assert b"".join(stream_csv(iter([]))).decode("utf-8").splitlines() == [",".join(EXPORT_COLUMNS)]
+
+
+def test_stream_parquet(monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(attendance_export, "PARQUET_ROW_GROUP_ROWS", 2)
+    data = b"".join(stream_parquet(iter(rows(5))))
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.column("user_name").to_pylist() == ["Ada, \"the first\""] * 5
+    assert table.column("date").to_pylist()[0] == START.date()
+
+
+def test_export_rows(database, monkeypatch):
+    monkeypatch.setattr(attendance_export, "db", database)
+    cse = database.users.insert_one({"name": "Ada", "roll_number": "1", "department": "CSE"}).inserted_id
+    ece = database.users.insert_one({"name": "Bob", "roll_number": "2", "department": "ECE"}).inserted_id
+    database.attendance.insert_many([
+        {"user_id": ece, "timestamp": START + timedelta(days=1)},
+        {"user_id": cse, "timestamp": START},
+        {"user_id": cse, "timestamp": START + timedelta(days=2)},
+        # Legacy string timestamp, and a record of a deleted user
+        {"user_id": cse, "timestamp": (START + timedelta(hours=1)).isoformat()},
+        {"user_id": "gone", "timestamp": START},
+    ])
+    # Oldest first; BSON ordering puts string timestamps before dates
+    assert [(name, ts) for _, name, _, ts in export_rows()] == [
+        ("Ada", START + timedelta(hours=1)), ("Ada", START), ("Bob", START + timedelta(days=1)),
+        ("Ada", START + timedelta(days=2))]
+
+    filters = parse_export_filters(MultiDict({"start": "2024-03-05", "end": "2024-03-06", "department": "CSE"}))
+    assert list(export_rows(**filters)) == [(str(cse), "Ada", "1", START + timedelta(days=2))]
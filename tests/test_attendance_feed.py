@@ -0,0 +1,73 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from attendance_feed import AttendanceFeed, feed_entry, load_recent_attendance
+from face_gallery import FaceGallery
+from conftest import random_encodings
+
+NOW = datetime(2024, 3, 5, 9, 30, 15)
+
+
+def test_feed_entry():
+    assert feed_entry("Ada", "R1", NOW) == {"name": "Ada", "roll_number": "R1", "time": "09:30:15",
+                                            "date": "2024-03-05"}
+
+
+def test_body_and_etag():
+    feed = AttendanceFeed(size=3)
+    assert not feed.seeded
+    feed.add("u1", "Ada", "R1", NOW)
+    feed.add("u2", "Bob", "R2", NOW + timedelta(minutes=1))
+    body, etag = feed.body()
+    assert [e["name"] for e in json.loads(body)] == ["Bob", "Ada"]
+    assert etag == hashlib.sha1(body).hexdigest()
+    # Another worker holding the same entries serves the same ETag
+    other = AttendanceFeed(size=3)
+    other.replace(feed._entries)
+    assert other.seeded
+    assert other.body() == (body, etag)
+    feed.add("u1", "Ada", "R1", NOW + timedelta(minutes=2))
+    assert feed.body()[1] != etag
+
+
+def test_size_bound_and_remove_user():
+    feed = AttendanceFeed(size=3)
+    for minute, user in enumerate(["u1", "u2", "u1", "u3"]):
+        feed.add(user, user.upper(), "R", NOW + timedelta(minutes=minute))
+    assert len(feed) == 3
+    assert [e["name"] for e in feed.entries()] == ["U3", "U1", "U2"]
+    _, etag = feed.body()
+    feed.remove_user("u9")
+    assert feed.body()[1] == etag
+    feed.remove_user("u1")
+    assert [e["name"] for e in feed.entries()] == ["U3", "U2"]
+    assert feed.body()[1] != etag
+
+
+def test_load_recent_attendance(database):
+    known, unknown, deleted = ObjectId(), ObjectId(), ObjectId()
+    gallery = FaceGallery([str(known)], ["Ada"], ["R1"], random_encodings(1))
+    database.users.insert_one({"_id": unknown, "name": "Bob", "roll_number": "R2"})
+    database.attendance.insert_many([
+        {"user_id": known, "timestamp": NOW},
+        {"user_id": unknown, "timestamp": NOW + timedelta(minutes=1)},
+        {"user_id": deleted, "timestamp": NOW + timedelta(minutes=2)},
+        {"user_id": known, "timestamp": NOW + timedelta(minutes=3)},
+        {"user_id": known, "timestamp": NOW - timedelta(days=1)},
+    ])
+    entries = load_recent_attendance(gallery, limit=4, database=database)
+    assert [(user_id, e["name"], e["time"]) for user_id, e in entries] == [
+        (str(known), "Ada", "09:33:15"),
+        (str(unknown), "Bob", "09:31:15"),
+        (str(known), "Ada", "09:30:15"),
+    ]
+
+
+def test_load_recent_attendance_without_gallery(database):
+    user = ObjectId()
+    database.users.insert_one({"_id": user, "name": "Ada", "roll_number": "R1"})
+    database.attendance.insert_one({"user_id": user, "timestamp": NOW})
+    assert load_recent_attendance(None, database=database) == [(str(user), feed_entry("Ada", "R1", NOW))]
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import ServerSelectionTimeoutError
+
+import attendance_utils
+from attendance_utils import AttendanceBuffer, apply_face_encoding_changes, load_face_encodings
+from conftest import random_encodings
+from encoding_codec import pack_encoding
+
+
+def insert_user(database, encoding, updated_at, name="user"):
+    user = {"name": name, "roll_number": name, "updated_at": updated_at, **pack_encoding(encoding)}
+    return str(database.users.insert_one(user).inserted_id)
+
+
+def test_load_face_encodings(database):
+    encodings = random_encodings(3)
+    ids = [insert_user(database, encoding, datetime.now(), f"u{i}") for i, encoding in enumerate(encodings)]
+    database.users.insert_one({"name": "broken", "roll_number": "x", "face_encoding": [1.0]})
+    gallery, errors = load_face_encodings(database)
+    assert errors == 1
+    assert gallery.ids == ids and gallery.watermark is not None
+    best, _ = gallery.match(encodings)
+    assert best.tolist() == [0, 1, 2]
+
+
+def test_apply_changes_adds_and_removes(database):
+    encodings = random_encodings(3)
+    kept = insert_user(database, encodings[0], datetime.now() - timedelta(hours=1))
+    deleted = insert_user(database, encodings[1], datetime.now() - timedelta(hours=1))
+    gallery, _ = load_face_encodings(database)
+
+    added = insert_user(database, encodings[2], datetime.now())
+    database.users.delete_one({"_id": ObjectId(deleted)})
+    database.user_deletions.insert_one({"user_id": ObjectId(deleted), "deleted_at": datetime.now()})
+    assert apply_face_encoding_changes(gallery, database) == (2, 0)
+    assert kept in gallery and added in gallery and deleted not in gallery
+    best, _ = gallery.match(encodings)
+    assert [gallery.ids[i] if i >= 0 else None for i in best] == [kept, None, added]
+
+    # Nothing new: nothing applied
+    watermark = gallery.watermark
+    assert apply_face_encoding_changes(gallery, database) == (0, 0)
+    assert gallery.watermark > watermark
+
+
+def test_apply_changes_rereads_overlap_window(database):
+    gallery, _ = load_face_encodings(database)
+    watermark = gallery.watermark
+    encodings = random_encodings(2)
+    # Written just before the watermark by a server with a slow clock
+    late = insert_user(database, encodings[0], watermark - timedelta(seconds=2))
+    # Applied already and unchanged since: skipped, not re-added
+    seen = insert_user(database, encodings[1], watermark - timedelta(seconds=2))
+    gallery.add(seen, "user", "user", encodings[1])
+    # Older than the overlap: assumed to be in the gallery
+    insert_user(database, encodings[1], watermark - timedelta(minutes=5))
+
+    assert apply_face_encoding_changes(gallery, database) == (1, 0)
+    assert late in gallery and len(gallery) == 2
+
+
+def test_apply_changes_counts_decoding_errors(database):
+    gallery, _ = load_face_encodings(database)
+    database.users.insert_one({"name": "broken", "roll_number": "x", "updated_at": datetime.now(),
+                               "face_encoding": [1.0]})
+    assert apply_face_encoding_changes(gallery, database) == (0, 1)
+
+
+def test_apply_changes_keeps_watermark_on_db_error(database, monkeypatch):
+    gallery, _ = load_face_encodings(database)
+    watermark = gallery.watermark
+
+    def unreachable(*args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    monkeypatch.setattr(type(database.users), "find", unreachable)
+    assert apply_face_encoding_changes(gallery, database) == (0, 0)
+    assert gallery.watermark == watermark
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """Records passed to the monthly summary update (which writes to the shared db)."""
+    written = []
+    monkeypatch.setattr(attendance_utils, "record_monthly_attendance", written.extend)
+    return written
+
+
+def test_buffer_dedups_per_minute(database, summaries):
+    buffer = AttendanceBuffer(database.attendance)
+    user_id = str(ObjectId())
+    minute = datetime(2024, 3, 4, 9, 0)
+    assert buffer.add(user_id, minute)
+    assert not buffer.add(user_id, minute + timedelta(seconds=59))
+    assert buffer.add(user_id, minute + timedelta(seconds=60))
+    assert buffer.add(str(ObjectId()), minute)
+    assert buffer.pending_for(user_id) == [minute, minute + timedelta(seconds=60)]
+
+    assert buffer.flush() == 3
+    assert len(buffer) == 0 and buffer.flush() == 0
+    assert database.attendance.count_documents({}) == 3
+    assert len(summaries) == 3
+
+
+def test_buffer_flushes_when_full(database, summaries, monkeypatch):
+    monkeypatch.setattr(attendance_utils, "ATTENDANCE_FLUSH_SIZE", 2)
+    buffer = AttendanceBuffer(database.attendance)
+    buffer.add(str(ObjectId()))
+    assert database.attendance.count_documents({}) == 0
+    buffer.add(str(ObjectId()))
+    assert database.attendance.count_documents({}) == 2 and len(buffer) == 0
+
+
+def test_buffer_skips_records_already_written(database, summaries):
+    user_id = str(ObjectId())
+    minute = datetime(2024, 3, 4, 9, 0)
+    first = AttendanceBuffer(database.attendance)
+    first.add(user_id, minute)
+    first.flush()
+
+    # Another worker recording the same user in the same minute
+    second = AttendanceBuffer(database.attendance)
+    second.add(user_id, minute + timedelta(seconds=30))
+    second.add(str(ObjectId()), minute)
+    assert second.flush() == 1
+    assert len(second) == 0
+    assert database.attendance.count_documents({"user_id": ObjectId(user_id)}) == 1
+
+
+def test_buffer_retries_after_failure(database, summaries, monkeypatch):
+    buffer = AttendanceBuffer(database.attendance)
+    user_id = str(ObjectId())
+    buffer.add(user_id, datetime(2024, 3, 4, 9, 0))
+
+    def unreachable(*args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    collection_type = type(database.attendance)
+    insert_many = collection_type.insert_many
+    monkeypatch.setattr(collection_type, "insert_many", unreachable)
+    assert buffer.flush() == 0
+    assert len(buffer) == 1 and not summaries
+    # Records queued while the database is down are kept too
+    assert not buffer.add(user_id, datetime(2024, 3, 4, 9, 0, 30))
+    buffer.add(user_id, datetime(2024, 3, 4, 9, 1))
+
+    monkeypatch.setattr(collection_type, "insert_many", insert_many)
+    assert buffer.flush() == 2
+    assert database.attendance.count_documents({}) == 2
@@ -0,0 +1,118 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+import bulk_enroll
+from bulk_enroll import DirectorySource, enroll, open_source, read_manifest
+from conftest import random_encodings
+from encoding_codec import unpack_encoding
+
+HEADER = "name,roll_number,department,role,image\n"
+
+
+def test_read_manifest_merges_samples():
+    people, failures = read_manifest(
+        " Name , Roll_Number ,department,role,image\n"
+        "Ada,1,CSE,Student,ada1.jpg; ada2.jpg\n"
+        "Ada,1,CSE,Student,ada3.jpg\n"
+        "Bob,2,ECE,Teacher,bob.jpg\n")
+    assert failures == []
+    assert people["1"] == {"name": "Ada", "roll_number": "1", "department": "CSE", "role": "Student",
+                           "images": ["ada1.jpg", "ada2.jpg", "ada3.jpg"]}
+    assert people["2"]["images"] == ["bob.jpg"]
+
+
+def test_read_manifest_rejects_bad_rows():
+    people, failures = read_manifest(HEADER +
+                                     "Ada,1,CSE,Admin,ada.jpg\n"
+                                     "Bob,2,ECE,student,bob.jpg\n"
+                                     "Cy,3,,Student,cy.jpg\n"
+                                     "Di,4,CSE,Student, ; \n"
+                                     "Ed,5,CSE,Student,ed.jpg\n")
+    assert list(people) == ["5"]
+    assert failures == [
+        {"roll_number": "1", "reason": "Invalid role"},
+        {"roll_number": "2", "reason": "Invalid role"},
+        {"roll_number": "3", "reason": "Missing required fields"},
+        {"roll_number": "4", "reason": "Missing required fields"},
+    ]
+
+
+def test_directory_source_stays_inside_root(tmp_path):
+    (tmp_path / "intake").mkdir()
+    (tmp_path / "intake" / "a.jpg").write_bytes(b"a")
+    (tmp_path / "secret").write_bytes(b"s")
+    source = open_source(str(tmp_path / "intake"))
+    assert isinstance(source, DirectorySource)
+    assert source.read("a.jpg") == b"a"
+    with pytest.raises(KeyError):
+        source.read("../secret")
+
+
+def zip_source(files):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    data.seek(0)
+    return open_source(data)
+
+
+def test_enroll(database, monkeypatch):
+    monkeypatch.setattr(bulk_enroll, "db", database)
+    database.users.insert_one({"name": "Old", "roll_number": "9"})
+    source = zip_source({
+        "manifest.csv": "﻿" + HEADER +
+                        "Ada,1,CSE,Student,ada1.jpg;ada2.jpg\n"
+                        "Bob,2,ECE,Teacher,bob.jpg\n"
+                        "Cy,3,CSE,Student,blank.jpg\n"
+                        "Di,4,CSE,Student,boom.jpg\n"
+                        "Ed,5,CSE,Janitor,ed.jpg\n"
+                        "Old,9,CSE,Student,old.jpg\n",
+        "ada1.jpg": b"ada", "ada2.jpg": b"ada", "bob.jpg": b"bob", "blank.jpg": b"", "boom.jpg": b"boom",
+    })
+    encodings = dict(zip(["ada", "bob"], random_encodings(2)))
+    calls = []
+
+    def encode_map(func, items):
+        assert func is bulk_enroll.encode_samples
+        calls.append(items)
+        results = []
+        for images in items:
+            if images == [b"boom"]:
+                results.append(ValueError("boom"))
+            elif images == [b""]:
+                results.append((None, 0))
+            else:
+                results.append((encodings[images[0].decode()], len(images)))
+        return results
+
+    registered, failures = enroll(source, encode_map, batch_size=2)
+    assert [len(batch) for batch in calls] == [2, 2]
+    assert [user["roll_number"] for user in registered] == ["1", "2"]
+    assert registered[0]["sample_count"] == 2
+    assert sorted(failures, key=lambda f: f["roll_number"]) == [
+        {"roll_number": "3", "reason": "No face detected"},
+        {"roll_number": "4", "reason": "Encoding failed: boom"},
+        {"roll_number": "5", "reason": "Invalid role"},
+        {"roll_number": "9", "reason": "Already registered"},
+    ]
+    stored = database.users.find_one({"roll_number": "1"})
+    np.testing.assert_array_equal(unpack_encoding(stored), encodings["ada"])
+    assert stored["updated_at"] is not None
+
+
+def test_enroll_reports_missing_images(database, monkeypatch):
+    monkeypatch.setattr(bulk_enroll, "db", database)
+    source = zip_source({"manifest.csv": HEADER + "Ada,1,CSE,Student,missing.jpg\n"})
+    seen = []
+
+    def encode_map(func, items):
+        seen.extend(items)
+        return [(None, 0) for _ in items]
+
+    registered, failures = enroll(source, encode_map)
+    assert seen == [[]]
+    assert registered == [] and failures == [{"roll_number": "1", "reason": "No face detected"}]
@@ -0,0 +1,48 @@
+import pytest
+
+import camera_sessions
+from camera_sessions import join_session, leave_session, session_for_sid
+
+
+@pytest.fixture(autouse=True)
+def clean_sessions(monkeypatch):
+    monkeypatch.setattr(camera_sessions, "sessions", {})
+    monkeypatch.setattr(camera_sessions, "camera_of_sid", {})
+
+
+def test_sid_gets_its_own_session_by_default():
+    session = session_for_sid("a")
+    assert session.camera_id == "a"
+    assert session_for_sid("a") is session
+    assert session_for_sid("b") is not session
+
+
+def test_sockets_share_a_camera_until_the_last_leaves():
+    first = join_session("a", "room-1", scope={"department": "CS"}, profile="classroom")
+    second = join_session("b", "room-1")
+    assert second is first
+    assert first.sids == {"a", "b"}
+    assert first.scope == {"department": "CS"}
+    assert first.scale.profile == "classroom"
+    first.pending_frames.append(b"frame")
+    leave_session("a")
+    assert camera_sessions.sessions["room-1"] is first
+    leave_session("b")
+    assert camera_sessions.sessions == {}
+    assert camera_sessions.camera_of_sid == {}
+    assert not first.pending_frames
+    # Unknown sockets are ignored
+    leave_session("b")
+
+
+def test_rejoining_moves_the_socket_and_updates_settings():
+    join_session("a", "room-1")
+    join_session("b", "room-1")
+    moved = join_session("a", "room-2")
+    assert camera_sessions.sessions["room-1"].sids == {"b"}
+    assert moved.sids == {"a"}
+    updated = join_session("c", "room-1", scope={"role": "student"}, profile="kiosk")
+    assert updated.scope == {"role": "student"}
+    assert updated.scale.profile == "kiosk"
+    # Joining without settings keeps the camera's existing ones
+    assert join_session("d", "room-1").scale.profile == "kiosk"
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from conftest import random_encodings
+from encoding_codec import ENCODING_FORMATS, pack_encoding, unpack_encoding
+from face_gallery import ENCODING_DIM
+
+
+@pytest.mark.parametrize("fmt, tolerance", [("float32", 0), ("float16", 1e-3), ("int8", 1e-2)])
+def test_round_trip(fmt, tolerance):
+    encoding = random_encodings(1)[0]
+    user = pack_encoding(encoding, fmt)
+    assert user["encoding_format"] == fmt
+    decoded = unpack_encoding(user)
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, encoding, atol=tolerance)
+
+
+@pytest.mark.parametrize("fmt", ENCODING_FORMATS)
+def test_unpack_into_row(fmt):
+    encodings = random_encodings(2)
+    out = np.zeros((2, ENCODING_DIM), dtype=np.float32)
+    unpack_encoding(pack_encoding(encodings[1], fmt), out=out[1])
+    assert not out[0].any()
+    np.testing.assert_allclose(out[1], encodings[1], atol=1e-2)
+
+
+def test_int8_zero_vector():
+    decoded = unpack_encoding(pack_encoding(np.zeros(ENCODING_DIM), "int8"))
+    assert not decoded.any()
+
+
+def test_legacy_list_encoding():
+    encoding = random_encodings(1)[0]
+    np.testing.assert_array_equal(unpack_encoding({"face_encoding": encoding.tolist()}), encoding)
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError):
+        pack_encoding(np.zeros(ENCODING_DIM), "bfloat16")
+    with pytest.raises(ValueError):
+        unpack_encoding({"face_encoding": [0.0] * 64})
+    truncated = pack_encoding(np.zeros(ENCODING_DIM), "float32")
+    truncated["face_encoding_bin"] = truncated["face_encoding_bin"][:100]
+    with pytest.raises(ValueError):
+        unpack_encoding(truncated)
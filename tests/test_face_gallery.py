@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+import face_gallery
+import matchers
+from conftest import random_encodings
+from face_gallery import FaceGallery
+
+
+def make_gallery(count, backend=None, departments=None, seed=0):
+    encodings = random_encodings(count, seed)
+    ids = [f"u{i}" for i in range(count)]
+    gallery = FaceGallery(ids, [f"name{i}" for i in range(count)], [str(i) for i in range(count)],
+                          encodings, departments=departments, backend=backend)
+    return gallery, encodings
+
+
+def matched_ids(gallery, queries, scope=None):
+    best, _ = gallery.match(queries, scope=scope)
+    return [gallery.ids[i] if i >= 0 else None for i in best]
+
+
+def test_match_finds_each_user():
+    gallery, encodings = make_gallery(50)
+    assert matched_ids(gallery, encodings[[3, 17, 49]]) == ["u3", "u17", "u49"]
+
+
+def test_match_outside_tolerance():
+    gallery, encodings = make_gallery(10)
+    best, dist = gallery.match(-encodings[:1])
+    assert best[0] == -1 and dist[0] > 0.5
+
+
+def test_empty_gallery_and_no_faces():
+    gallery = FaceGallery([], [], [], [])
+    best, dist = gallery.match(random_encodings(2))
+    assert best.tolist() == [-1, -1] and np.isinf(dist).all()
+    best, _ = make_gallery(5)[0].match([])
+    assert len(best) == 0
+
+
+def test_add_and_replace():
+    gallery, encodings = make_gallery(20)
+    new = random_encodings(2, seed=1)
+    gallery.add("new", "New", "99", new[0])
+    assert len(gallery) == 21 and "new" in gallery
+    assert gallery.lookup("new") == ("New", "99")
+    assert matched_ids(gallery, new[:1]) == ["new"]
+
+    # Re-adding an id replaces the old row
+    gallery.add("new", "Renamed", "99", new[1])
+    assert len(gallery) == 21
+    assert matched_ids(gallery, new) == [None, "new"]
+    assert gallery.lookup("new") == ("Renamed", "99")
+
+
+def test_remove_masks_user():
+    gallery, encodings = make_gallery(20)
+    assert gallery.remove("u5")
+    assert not gallery.remove("u5")
+    assert "u5" not in gallery and gallery.lookup("u5") is None
+    assert len(gallery) == 19 and gallery.row_count == 20
+    assert matched_ids(gallery, encodings[[5, 6]]) == [None, "u6"]
+
+
+def test_compact_after_many_removals(monkeypatch):
+    monkeypatch.setattr(face_gallery, "COMPACT_MIN_REMOVED", 4)
+    gallery, encodings = make_gallery(12)
+    for i in range(4):
+        gallery.remove(f"u{i}")
+    # 4 of 12 removed is over the 25% ratio
+    assert gallery.removed_count == 0 and gallery.row_count == 8
+    assert gallery.ids == [f"u{i}" for i in range(4, 12)]
+    assert matched_ids(gallery, encodings[[0, 4, 11]]) == [None, "u4", "u11"]
+    assert gallery.lookup("u11") == ("name11", "11")
+
+
+def test_add_grows_storage():
+    gallery, _ = make_gallery(3)
+    new = random_encodings(40, seed=1)
+    for i, encoding in enumerate(new):
+        gallery.add(f"n{i}", "n", "n", encoding)
+    assert len(gallery) == 43
+    assert matched_ids(gallery, new[[0, 39]]) == ["n0", "n39"]
+
+
+def test_reserve_keeps_storage():
+    gallery, _ = make_gallery(10)
+    gallery.reserve(5)
+    storage = gallery._encodings
+    for i, encoding in enumerate(random_encodings(5, seed=1)):
+        gallery.add(f"n{i}", "n", "n", encoding)
+    assert gallery._encodings is storage
+    assert len(gallery) == 15
+
+
+def test_scoped_matchers():
+    departments = ["CSE" if i % 2 else "ECE" for i in range(20)]
+    gallery, encodings = make_gallery(20, departments=departments)
+    assert matched_ids(gallery, encodings[[1, 2]], scope={"department": "CSE"}) == ["u1", None]
+
+    # Scoped matchers built before an add or remove stay in sync
+    new = random_encodings(2, seed=1)
+    gallery.add("cse", "n", "n", new[0], department="CSE")
+    gallery.add("ece", "n", "n", new[1], department="ECE")
+    gallery.remove("u3")
+    assert matched_ids(gallery, np.vstack([new, encodings[3:4]]), scope={"department": "CSE"}) == \
+        ["cse", None, None]
+    assert matched_ids(gallery, new, scope={"department": "ECE"}) == [None, "ece"]
+
+
+def test_scope_validation():
+    gallery, _ = make_gallery(5)
+    assert gallery.matcher_for({"department": None}) is gallery.matcher
+    with pytest.raises(ValueError):
+        gallery.matcher_for({"building": "A"})
+
+
+def test_ivf_matcher(monkeypatch):
+    monkeypatch.setattr(matchers, "IVF_MIN_SIZE", 100)
+    departments = ["CSE" if i % 2 else "ECE" for i in range(400)]
+    gallery, encodings = make_gallery(400, backend="ivf", departments=departments)
+    assert isinstance(gallery.matcher, matchers.IVFMatcher)
+    assert isinstance(gallery.matcher_for({"department": "CSE"}), matchers.IVFMatcher)
+
+    # Probing every partition makes the search exact
+    gallery.matcher.n_probe = len(gallery.matcher.centroids)
+    assert matched_ids(gallery, encodings[[0, 199, 399]]) == ["u0", "u199", "u399"]
+
+    new = random_encodings(1, seed=1)
+    gallery.add("new", "n", "n", new[0], department="CSE")
+    gallery.remove("u199")
+    assert matched_ids(gallery, np.vstack([new, encodings[199:200]])) == ["new", None]
+    scoped = gallery.matcher_for({"department": "CSE"})
+    scoped.n_probe = len(scoped.centroids)
+    assert matched_ids(gallery, np.vstack([new, encodings[[2, 3]]]), scope={"department": "CSE"}) == \
+        ["new", None, "u3"]
+
+
+def test_small_gallery_uses_exact_scan():
+    gallery, _ = make_gallery(10, backend="ivf")
+    assert isinstance(gallery.matcher, matchers.BruteForceMatcher)
+    with pytest.raises(ValueError):
+        make_gallery(10, backend="annoy")
@@ -0,0 +1,44 @@
+from face_tracker import box_iou, plan_encodings
+
+# (top, right, bottom, left)
+BOX = (100, 200, 200, 100)
+
+
+def shifted(box, dx):
+    top, right, bottom, left = box
+    return top, right + dx, bottom, left + dx
+
+
+def test_box_iou():
+    assert box_iou(BOX, BOX) == 1.0
+    assert box_iou(BOX, shifted(BOX, 100)) == 0.0
+    assert box_iou(BOX, shifted(BOX, 50)) == 50 / 150
+
+
+def test_new_faces_are_encoded():
+    assert plan_encodings([BOX], []) == ([-1], [True])
+    assert plan_encodings([], [(BOX, False)]) == ([], [])
+
+
+def test_still_face_reuses_identity():
+    assert plan_encodings([shifted(BOX, 5)], [(BOX, False)]) == ([0], [False])
+
+
+def test_stale_track_is_reencoded():
+    assert plan_encodings([BOX], [(BOX, True)]) == ([0], [True])
+
+
+def test_moved_face_is_reencoded():
+    # Same track (IoU 0.43) but moved too far to trust the old encoding
+    assert plan_encodings([shifted(BOX, 40)], [(BOX, False)]) == ([0], [True])
+    # Too far to be the same face at all
+    assert plan_encodings([shifted(BOX, 80)], [(BOX, False)]) == ([-1], [True])
+
+
+def test_best_overlap_claims_track():
+    other = shifted(BOX, 300)
+    boxes = [shifted(BOX, 30), shifted(BOX, 2), shifted(other, 1)]
+    matched, encode = plan_encodings(boxes, [(BOX, False), (other, False)])
+    # The closer box takes the first track; the farther one is a new face
+    assert matched == [-1, 0, 1]
+    assert encode == [True, False, False]
@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def main_module():
+    import main
+    return main
+
+
+@pytest.fixture
+def socket_client(main_module):
+    client = main_module.socketio.test_client(main_module.app)
+    yield client
+    client.disconnect()
+
+
+def counts(main_module, *outcomes):
+    return [main_module.frames_total.labels(outcome).value for outcome in outcomes]
+
+
+@pytest.mark.parametrize("payload", ["data:image/jpeg;base64,AAAA", {"frame": "x"}, 42, None])
+def test_binary_frame_event_rejects_other_payloads(main_module, socket_client, payload, monkeypatch):
+    queued = []
+    monkeypatch.setattr(main_module, "queue_frame", lambda session, data: queued.append(data))
+    before = counts(main_module, "received", "dropped")
+    socket_client.emit("video_frame_bin", payload)
+    assert not queued
+    assert counts(main_module, "received", "dropped") == [before[0] + 1, before[1] + 1]
+
+
+def test_binary_frame_event_queues_bytes(main_module, socket_client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(main_module, "queue_frame", lambda session, data: queued.append(data))
+    socket_client.emit("video_frame_bin", b"\xff\xd8jpeg")
+    assert queued == [b"\xff\xd8jpeg"]
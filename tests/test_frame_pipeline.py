@@ -0,0 +1,55 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from frame_pipeline import decode_frame, decode_image, jpeg_size
+
+
+def encode(extension, width=64, height=48, params=()):
+    image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    ok, data = cv2.imencode(extension, image, list(params))
+    assert ok
+    return data.tobytes()
+
+
+@pytest.mark.parametrize("params", [(), (cv2.IMWRITE_JPEG_PROGRESSIVE, 1)])
+def test_jpeg_size(params):
+    assert jpeg_size(encode(".jpg", 640, 480, params)) == (640, 480)
+    assert jpeg_size(encode(".jpg", 17, 1001, params)) == (17, 1001)
+
+
+def test_jpeg_size_accepts_buffers():
+    data = encode(".jpg")
+    assert jpeg_size(bytearray(data)) == (64, 48)
+    assert jpeg_size(np.frombuffer(data, dtype=np.uint8)) == (64, 48)
+
+
+def test_jpeg_size_not_a_jpeg():
+    assert jpeg_size(encode(".png")) is None
+    assert jpeg_size(b"") is None
+    assert jpeg_size(b"\xff\xd8") is None
+
+
+def test_jpeg_size_truncated_or_corrupt():
+    data = encode(".jpg")
+    assert jpeg_size(data[:20]) is None
+    # A segment that does not start with a marker
+    assert jpeg_size(b"\xff\xd8" + b"\x00" * 32) is None
+
+
+@pytest.mark.parametrize("width, decoded_width", [(640, 640), (1920, 1920), (2560, 1280), (6000, 1500)])
+def test_decode_image_reduces_only_past_twice_max_width(width, decoded_width):
+    frame = decode_image(encode(".jpg", width, width * 3 // 4), max_width=1280)
+    assert frame.shape[1] == decoded_width
+
+
+def test_decode_frame_accepts_data_urls():
+    data = encode(".jpg")
+    data_url = "data:image/jpeg;base64," + base64.b64encode(data).decode()
+    timings = {}
+    assert decode_frame(data_url, timings).shape == (48, 64, 3)
+    assert set(timings) == {"base64", "imdecode"}
+    with pytest.raises(ValueError):
+        decode_frame(b"not an image")
@@ -0,0 +1,106 @@
+import json
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import gallery_snapshot
+from conftest import random_encodings
+from face_gallery import FaceGallery
+from gallery_snapshot import SNAPSHOT_MAGIC, load_snapshot, save_snapshot
+
+
+@pytest.fixture
+def gallery():
+    encodings = random_encodings(5)
+    gallery = FaceGallery([f"u{i}" for i in range(5)], [f"name{i}" for i in range(5)], [str(i) for i in range(5)],
+                          encodings, departments=["CSE", "ECE", "CSE", None, "CSE"], roles=["student"] * 5)
+    gallery.watermark = datetime(2024, 3, 4, 9, 0)
+    return gallery
+
+
+def test_round_trip(tmp_path, gallery):
+    path = str(tmp_path / "gallery.bin")
+    gallery.remove("u1")
+    assert save_snapshot(gallery, path)
+    loaded = load_snapshot(path)
+    assert loaded.ids == ["u0", "u2", "u3", "u4"]
+    assert loaded.names == ["name0", "name2", "name3", "name4"]
+    assert loaded.departments == ["CSE", "CSE", None, "CSE"]
+    assert loaded.watermark == gallery.watermark
+    np.testing.assert_array_equal(loaded.encodings, gallery.encodings[[0, 2, 3, 4]])
+    # Mapped from the file, not read into memory
+    assert not loaded._encodings.flags.owndata
+    best, _ = loaded.match(gallery.encodings[[2, 1]], scope={"department": "CSE"})
+    assert best.tolist() == [1, -1]
+
+
+def test_loaded_gallery_is_writable_without_touching_file(tmp_path, gallery):
+    path = tmp_path / "gallery.bin"
+    save_snapshot(gallery, str(path))
+    saved = path.read_bytes()
+    loaded = load_snapshot(str(path))
+    loaded.add("u0", "renamed", "0", random_encodings(1, seed=1)[0])
+    loaded._encodings[0] = 0
+    del loaded
+    assert path.read_bytes() == saved
+
+
+def test_file_layout(tmp_path, gallery):
+    path = tmp_path / "gallery.bin"
+    save_snapshot(gallery, str(path))
+    data = path.read_bytes()
+    assert data.startswith(SNAPSHOT_MAGIC)
+    (header_length,) = struct.unpack("<Q", data[len(SNAPSHOT_MAGIC):len(SNAPSHOT_MAGIC) + 8])
+    header = json.loads(data[len(SNAPSHOT_MAGIC) + 8:len(SNAPSHOT_MAGIC) + 8 + header_length])
+    assert header["rows"] == 5 and header["watermark"] == "2024-03-04T09:00:00"
+    # Encodings start on a page boundary and end the file
+    assert len(data) % 4096 == 5 * 128 * 4 % 4096
+    assert np.frombuffer(data[-5 * 128 * 4:], dtype="<f4").reshape(5, 128).tolist() == gallery.encodings.tolist()
+
+
+def test_empty_gallery(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    gallery = FaceGallery([], [], [], [])
+    gallery.watermark = datetime(2024, 3, 4)
+    save_snapshot(gallery, path)
+    loaded = load_snapshot(path)
+    assert len(loaded) == 0 and loaded.watermark == gallery.watermark
+
+
+@pytest.mark.parametrize("cut", [1000, 5 * 128 * 4, 4])
+def test_truncated_snapshot_is_ignored(tmp_path, gallery, cut):
+    path = tmp_path / "gallery.bin"
+    save_snapshot(gallery, str(path))
+    path.write_bytes(path.read_bytes()[:-cut])
+    assert load_snapshot(str(path)) is None
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:20],
+    lambda data: b"NOTSNAP!" + data[8:],
+    lambda data: data.replace(b'"rows": 5', b'"rows": 9'),
+    lambda data: data.replace(b'"watermark": "2024', b'"watermark": "XXXX'),
+    lambda data: data.replace(b'"names"', b'"nameZ"'),
+])
+def test_damaged_snapshot_is_ignored(tmp_path, gallery, damage):
+    path = tmp_path / "gallery.bin"
+    save_snapshot(gallery, str(path))
+    path.write_bytes(damage(path.read_bytes()))
+    assert load_snapshot(str(path)) is None
+
+
+def test_missing_stale_or_unwatermarked(tmp_path, gallery, monkeypatch):
+    path = str(tmp_path / "gallery.bin")
+    assert load_snapshot(path) is None
+    save_snapshot(gallery, path)
+    monkeypatch.setattr(gallery_snapshot, "USER_DELETIONS_TTL_SECONDS", 60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert load_snapshot(path) is None
+    monkeypatch.undo()
+    gallery.watermark = None
+    save_snapshot(gallery, path)
+    assert load_snapshot(path) is None
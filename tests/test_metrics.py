@@ -0,0 +1,81 @@
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram, render
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Metrics created by a test are rendered on their own."""
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+
+
+def bucket_counts(histogram, label=None):
+    lines = histogram.render()
+    return [int(line.rsplit(" ", 1)[1]) for line in lines if "_bucket{" in line and
+            (label is None or f'"{label}"' in line)]
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("test_seconds", "Test.", buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.3, 0.5, 2.0):
+        histogram.observe(value)
+    # le is "less than or equal": 0.1 and 0.5 land in their own buckets
+    assert bucket_counts(histogram) == [2, 4, 4, 5]
+    lines = histogram.render()
+    assert 'test_seconds_bucket{le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 5' in lines
+    assert "test_seconds_count 5" in lines
+    assert lines[-2] == "test_seconds_sum 2.95"
+
+
+def test_labelled_histogram():
+    histogram = Histogram("test_stage_seconds", "Per stage.", label="stage", buckets=(1.0,))
+    histogram.labels("detect").observe(0.5)
+    histogram.labels("encode").observe(3.0)
+    histogram.labels("detect").observe(2.0)
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_stage_seconds Per stage.", "# TYPE test_stage_seconds histogram"]
+    # Series are sorted by label value
+    assert lines[2:] == [
+        'test_stage_seconds_bucket{stage="detect",le="1.0"} 1',
+        'test_stage_seconds_bucket{stage="detect",le="+Inf"} 2',
+        'test_stage_seconds_sum{stage="detect"} 2.5',
+        'test_stage_seconds_count{stage="detect"} 2',
+        'test_stage_seconds_bucket{stage="encode",le="1.0"} 0',
+        'test_stage_seconds_bucket{stage="encode",le="+Inf"} 1',
+        'test_stage_seconds_sum{stage="encode"} 3.0',
+        'test_stage_seconds_count{stage="encode"} 1',
+    ]
+
+
+def test_timer_observes_block(monkeypatch):
+    histogram = Histogram("test_seconds", "Test.", label="op", buckets=(1.0,))
+    clock = iter([10.0, 10.25])
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: next(clock))
+    with histogram.time("insert"):
+        pass
+    child = histogram.labels("insert")
+    assert (child.count, child.sum) == (1, 0.25)
+
+
+def test_counter_and_gauge():
+    frames = Counter("test_frames_total", "Frames.", label="outcome")
+    frames.labels("processed").inc()
+    frames.labels("processed").inc(2)
+    frames.labels("dropped").inc()
+    plain = Counter("test_events_total", "Events.")
+    size = Gauge("test_gallery_size", "Users.", lambda: 42)
+    loaded = Gauge("test_load_seconds", "Load.")
+    loaded.set(1.5)
+    assert frames.render()[2:] == ['test_frames_total{outcome="dropped"} 1', 'test_frames_total{outcome="processed"} 3']
+    assert plain.render()[2:] == ["test_events_total 0"]
+    assert size.render()[2:] == ["test_gallery_size 42"]
+    assert loaded.render()[2:] == ["test_load_seconds 1.5"]
+
+
+def test_render_concatenates_registry():
+    Counter("test_a_total", "A.").inc()
+    Gauge("test_b", "B.", lambda: 7)
+    assert render() == ("# HELP test_a_total A.\n# TYPE test_a_total counter\ntest_a_total 1\n"
+                        "# HELP test_b B.\n# TYPE test_b gauge\ntest_b 7\n")
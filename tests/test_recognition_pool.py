@@ -0,0 +1,49 @@
+import os
+import signal
+import time
+
+import pytest
+
+import recognition_pool
+from recognition_pool import RecognitionPool
+
+
+@pytest.fixture
+def pool():
+    pool = RecognitionPool(1)
+    yield pool
+    pool.close()
+
+
+def test_runs_in_worker(pool):
+    assert pool.run(os.getpid) != os.getpid()
+    with pytest.raises(RuntimeError, match="No such file"):
+        pool.run(os.stat, "/nonexistent")
+
+
+def test_killed_worker_is_replaced(pool):
+    pid = pool.run(os.getpid)
+    os.kill(pid, signal.SIGKILL)
+    process = next(iter(pool._processes.values()))
+    process.join(timeout=5)
+    with pytest.raises(RuntimeError, match="lost"):
+        pool.run(os.getpid)
+    new_pid = pool.run(os.getpid)
+    assert new_pid != pid
+    assert len(pool._processes) == 1
+
+
+def test_worker_exiting_during_job_is_replaced(pool):
+    with pytest.raises(RuntimeError, match="lost"):
+        pool.run(os._exit, 3)
+    assert pool.run(os.getpid) > 0
+
+
+def test_stuck_worker_is_replaced(pool, monkeypatch):
+    monkeypatch.setattr(recognition_pool, "RECOGNITION_TIMEOUT_SECONDS", 0.5)
+    pid = pool.run(os.getpid)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="lost"):
+        pool.run(time.sleep, 30)
+    assert time.monotonic() - started < 5
+    assert pool.run(os.getpid) != pid
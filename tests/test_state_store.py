@@ -0,0 +1,78 @@
+import time
+
+import fakeredis
+import pytest
+
+from state_store import MemoryStateStore, RedisStateStore, create_state_store
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryStateStore()
+    return RedisStateStore(fakeredis.FakeRedis())
+
+
+def test_flags(store):
+    assert not store.get_flag("running")
+    store.set_flag("running", True)
+    assert store.get_flag("running")
+    store.set_flag("running", False)
+    assert not store.get_flag("running")
+
+
+def test_claims(store):
+    assert store.claim("attendance:u1", 60)
+    assert not store.claim("attendance:u1", 60)
+    assert store.claim("attendance:u2", 60)
+    store.release("attendance:u1")
+    assert store.claim("attendance:u1", 60)
+
+
+def test_claim_expires(store, monkeypatch):
+    assert store.claim("emit:cam:u1", 1)
+    if isinstance(store, RedisStateStore):
+        store.client.pexpire(store.prefix + "claim:emit:cam:u1", 1)
+        time.sleep(0.01)
+    else:
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 2)
+    assert store.claim("emit:cam:u1", 1)
+
+
+def test_clear_claims_by_prefix(store):
+    store.claim("emit:cam1:u1", 60)
+    store.claim("emit:cam1:u2", 60)
+    store.claim("emit:cam2:u1", 60)
+    store.clear_claims("emit:cam1:")
+    assert store.claim("emit:cam1:u1", 60)
+    assert store.claim("emit:cam1:u2", 60)
+    assert not store.claim("emit:cam2:u1", 60)
+
+
+def test_presence(store, monkeypatch):
+    store.mark_present("cam1", "u1")
+    store.mark_present("cam1", "u1")
+    store.mark_present("cam2", "u1")
+    store.mark_present("cam1", "u2")
+    assert store.present_count(10) == 3
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 20)
+    store.mark_present("cam1", "u3")
+    assert store.present_count(10) == 1
+    store.clear_presence()
+    assert store.present_count(10) == 0
+
+
+def test_redis_keys_are_prefixed():
+    client = fakeredis.FakeRedis()
+    store = RedisStateStore(client, prefix="test:")
+    store.set_flag("running", True)
+    store.claim("attendance:u1", 60)
+    store.mark_present("cam1", "u1")
+    assert sorted(client.keys()) == [b"test:claim:attendance:u1", b"test:flag:running", b"test:presence"]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_state_store("memcached")
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import attendance_summary
+import attendance_utils
+import user_utils
+from attendance_utils import AttendanceBuffer
+from user_utils import get_user_history, parse_history_cursor
+
+START = datetime.now().replace(day=1, hour=9, minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+def history_db(database, monkeypatch):
+    """Point the history and summary queries at ``database`` with an empty buffer and cache."""
+    monkeypatch.setattr(user_utils, "db", database)
+    monkeypatch.setattr(attendance_summary, "db", database)
+    monkeypatch.setattr(attendance_utils, "record_monthly_attendance", lambda records: None)
+    buffer = AttendanceBuffer(database.attendance)
+    monkeypatch.setattr(user_utils, "attendance_buffer", buffer)
+    attendance_summary.summary_cache._data.clear()
+    yield database
+    attendance_summary.summary_cache._data.clear()
+
+
+def add_user(database, records=0):
+    user_id = database.users.insert_one({"name": "Ada", "roll_number": "1", "department": "CSE",
+                                         "role": "student"}).inserted_id
+    if records:
+        database.attendance.insert_many([{"user_id": user_id, "timestamp": START + timedelta(minutes=i)}
+                                         for i in range(records)])
+    return str(user_id)
+
+
+def test_parse_history_cursor():
+    assert parse_history_cursor(None) is None
+    assert parse_history_cursor("") is None
+    assert parse_history_cursor("2024-03-04T09:10:00.250000") == datetime(2024, 3, 4, 9, 10, 0, 250000)
+    with pytest.raises(ValueError):
+        parse_history_cursor("yesterday")
+
+
+def test_cursor_paging(history_db):
+    user_id = add_user(history_db, records=25)
+    seen = []
+    cursor = None
+    while True:
+        page = get_user_history(user_id, limit=10, before=cursor)
+        seen += [(record["date"], record["time"]) for record in page["history"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert parse_history_cursor(cursor) == START + timedelta(minutes=25 - len(seen))
+    expected = [START + timedelta(minutes=i) for i in reversed(range(25))]
+    assert seen == [(ts.strftime('%Y-%m-%d'), ts.strftime('%H:%M:%S')) for ts in expected]
+
+
+def test_exact_page_has_no_cursor(history_db):
+    user_id = add_user(history_db, records=10)
+    assert get_user_history(user_id, limit=10)["next_cursor"] is None
+
+
+def test_unknown_user(history_db):
+    assert get_user_history(str(ObjectId())) == {"error": "User not found"}
+
+
+def test_buffered_records_are_included_and_not_cached_away(history_db):
+    user_id = add_user(history_db, records=2)
+    buffered = START + timedelta(minutes=30)
+    user_utils.attendance_buffer.add(user_id, buffered)
+
+    page = get_user_history(user_id)
+    assert page["history"][0]["time"] == buffered.strftime('%H:%M:%S')
+    assert len(page["history"]) == 3
+    assert page["attended_dates"] == [START.strftime('%Y-%m-%d')]
+
+    # Once flushed, the cached summary still has the record
+    user_utils.attendance_buffer.flush()
+    summary = attendance_summary.get_user_summary(user_id)
+    assert summary["attended_dates"] == [START.strftime('%Y-%m-%d')]
+    assert summary["history"][0]["time"] == buffered.strftime('%H:%M:%S')
+    assert len(get_user_history(user_id)["history"]) == 3
+
+
+def test_buffered_records_respect_cursor(history_db):
+    user_id = add_user(history_db, records=4)
+    # Buffered but older than what is already stored (e.g. from a video import)
+    user_utils.attendance_buffer.add(user_id, START - timedelta(minutes=1))
+    first = get_user_history(user_id, limit=3)
+    second = get_user_history(user_id, limit=3, before=first["next_cursor"])
+    assert [record["time"] for record in second["history"]] == \
+        [(START + timedelta(minutes=m)).strftime('%H:%M:%S') for m in (0, -1)]
+    assert second["next_cursor"] is None
+
+
+@pytest.fixture
+def client(history_db, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "get_user_history", get_user_history)
+    return main.app.test_client()
+
+
+def test_history_route(client, history_db):
+    user_id = add_user(history_db, records=3)
+    response = client.get(f"/get_user_history?user_id={user_id}&limit=2")
+    assert response.status_code == 200
+    cursor = response.get_json()["next_cursor"]
+    response = client.get(f"/get_user_history?user_id={user_id}&limit=2&before={cursor}")
+    assert len(response.get_json()["history"]) == 1
+    assert client.get(f"/get_user_history?user_id={ObjectId()}").status_code == 404
+
+
+@pytest.mark.parametrize("query", ["", "user_id=nope", "user_id={user_id}&before=yesterday",
+                                   "user_id={user_id}&limit=ten"])
+def test_history_route_rejects_bad_arguments(client, history_db, query):
+    user_id = add_user(history_db)
+    response = client.get("/get_user_history?" + query.format(user_id=user_id))
+    assert response.status_code == 400
+    assert "error" in response.get_json()
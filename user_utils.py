@@ -1,82 +1,97 @@
 from config import db
-import face_recognition
-import numpy as np
-import cv2
-from datetime import datetime, date, timedelta
+from datetime import datetime
 import logging
+import cv2
+import numpy as np
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from detectors import detect_faces, detection_params, encode_faces, largest_face
+from encoding_codec import pack_encoding
+from attendance_summary import get_user_summary
+from attendance_utils import attendance_buffer
+from metrics import db_seconds
 
 logger = logging.getLogger(__name__)
 
-def register_user(name, roll_number, department, role, captured_frame):
-    try:
-        rgb_frame = cv2.cvtColor(captured_frame, cv2.COLOR_BGR2RGB)
-        encodings = face_recognition.face_encodings(rgb_frame)
-        if not encodings:
-            return False, "No face detected"
-        face_encoding = encodings[0].tolist()  # Save as list, not bytes
+def encode_registration(image_data):
+    """Encoding of the largest face in an encoded image: (encoding, None) or (None, reason).
+
+    Decoding, detection and encoding are CPU-bound; the web process runs
+    this on a recognition worker (see recognition_pool).
+    """
+    frame = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None, "Could not decode image"
+    face_locations, _ = detect_faces(frame, *detection_params("register"))
+    if not face_locations:
+        return None, "No face detected in frame"
+    top, right, bottom, left = largest_face(face_locations)
+    h, w = frame.shape[:2]  # bounds check
+    top, bottom = max(0, top), min(h, bottom)
+    left, right = max(0, left), min(w, right)
+    if top >= bottom or left >= right:
+        return None, "Invalid face crop"
+    encodings = encode_faces(frame, [(top, right, bottom, left)])
+    if not encodings:
+        return None, "No face detected"
+    return np.asarray(encodings[0], dtype=np.float32), None
 
-        db.users.insert_one({
+def register_user(name, roll_number, department, role, encoding):
+    try:
+        user = {
             "name": name,
             "roll_number": roll_number,
             "department": department,
             "role": role,
-            "face_encoding": face_encoding
-        })
-        return True, "User registered"
+            "updated_at": datetime.now(),
+            **pack_encoding(encoding)
+        }
+        db.users.insert_one(user)
+        return True, "User registered", user
+    except DuplicateKeyError:
+        return False, "Roll number already registered", None
     except Exception as e:
         logger.error(f"Registration error: {e}")
-        return False, "Failed"
-
-def get_user_history(user_id):
-    try:
-        obj_id = ObjectId(user_id)
-        user = db.users.find_one({"_id": obj_id})
-        if not user:
-            return {'error': 'User not found'}
+        return False, "Failed", None
 
-        history_cursor = db.attendance.find({"user_id": obj_id}).sort("timestamp", -1)
-        history = [{
-            "time": ts["timestamp"].strftime('%H:%M:%S'),
-            "date": ts["timestamp"].strftime('%Y-%m-%d')
-        } for ts in history_cursor]
+HISTORY_PAGE_SIZE = 50
 
-        today = date.today()
-        first_day = today.replace(day=1)
-        next_month = date(today.year + (today.month // 12), (today.month % 12) + 1, 1)
+def parse_history_cursor(before):
+    """Timestamp of a ``next_cursor`` value (None for the first page); ValueError if malformed."""
+    return datetime.fromisoformat(before) if before else None
 
-        attended_dates = db.attendance.aggregate([
-            {"$match": {
-                "user_id": obj_id,
-                "timestamp": {
-                    "$gte": datetime.combine(first_day, datetime.min.time()),
-                    "$lt": datetime.combine(next_month, datetime.min.time())
-                }
-            }},
-            {"$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
-            }}
-        ])
+def get_user_history(user_id, limit=HISTORY_PAGE_SIZE, before=None):
+    """User summary plus one page of attendance history, newest first.
 
-        attended_set = {entry['_id'] for entry in attended_dates}
-        working_days = [
-            (first_day + timedelta(days=i)).strftime('%Y-%m-%d')
-            for i in range((today - first_day).days + 1)
-            if (first_day + timedelta(days=i)).weekday() < 5
-        ]
+    ``before`` is the ``next_cursor`` returned with the previous page.
+    Records still in the attendance write buffer are included, as on the
+    recognition path, so neither the page nor the cached summary misses them.
+    """
+    try:
+        pending = attendance_buffer.pending_for(user_id)
+        user_data = get_user_summary(user_id, pending)
+        if 'error' in user_data:
+            return user_data
 
-        percentage = (len(attended_set) / len(working_days) * 100) if working_days else 0
+        query = {"user_id": ObjectId(user_id)}
+        before = parse_history_cursor(before)
+        if before:
+            query["timestamp"] = {"$lt": before}
+            pending = [ts for ts in pending if ts < before]
+        with db_seconds.time("history_page"):
+            history_cursor = db.attendance.find(query, {"timestamp": 1}).sort("timestamp", -1).limit(limit + 1)
+            timestamps = [record["timestamp"] for record in history_cursor]
+        if pending:
+            timestamps = sorted(timestamps + pending, reverse=True)
+        page = timestamps[:limit]
 
-        return {
-            "name": user["name"],
-            "roll_number": user["roll_number"],
-            "department": user["department"],
-            "role": user["role"],
-            "history": history,
-            "attended_dates": list(attended_set),
-            "attendance_percentage": round(percentage, 2)
-        }
+        user_data["history"] = [{
+            "time": ts.strftime('%H:%M:%S'),
+            "date": ts.strftime('%Y-%m-%d')
+        } for ts in page]
+        user_data["next_cursor"] = page[-1].isoformat() if len(timestamps) > limit else None
+        return user_data
     except Exception as e:
         logger.error(f"Get history error: {e}")
         return {"error": "Server error"}
-